@@ -0,0 +1,19 @@
+import os
+import contextlib
+
+
+@contextlib.contextmanager
+def atomic_write(fn: str, mode: str = "w"):
+    """
+    Open a temporary file next to fn to write to, which replaces fn once the block
+    completes, so readers never see a half-written fn. If the block raises, fn is
+    left as it was. The temporary file is removed either way
+    """
+    tmp_fn = f"{fn}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_fn, mode) as f:
+            yield f
+        os.replace(tmp_fn, fn)
+    finally:
+        if os.path.exists(tmp_fn):
+            os.remove(tmp_fn)
@@ -0,0 +1,181 @@
+"""
+Benchmark of each compiler stage on a synthetic class from benchmarks/generator.py
+
+Times tokenizing (Tokenizer), parsing (CompilationEngine), writing the XML parse
+tree, generating VM code (CodeGenerator) and writing the .vm file separately, and
+reports each as tokens/s and source lines/s along with the peak RSS of the
+process. Results are written to a JSON file. Given a baseline JSON file from an
+earlier run, the change of each stage against it is printed as well.
+
+Usage: python benchmarks/compile_bench.py [--output results.json]
+       [--baseline baseline.json] [--repeat N] [--subroutines N] [--statements N]
+       [--depth N] [--string-density P] [--comment-density P] [--seed N]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from benchmarks.generator import JackGenerator  # noqa: E402
+from code_generator import CodeGenerator  # noqa: E402
+from compilation_engine import CompilationEngine  # noqa: E402
+from parse_tree import XMLParseTreeWriter, render_parse_tree  # noqa: E402
+from tokenizer import Tokenizer  # noqa: E402
+
+STAGES = ["tokenize", "parse", "xml", "codegen", "write_vm"]
+
+CLASS_NAME = "Bench"
+
+
+def peak_rss_kb() -> int:
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak_rss // 1024 if sys.platform == "darwin" else peak_rss
+
+
+def time_stages(jack_fn: str, output_dir: str) -> tuple:
+    """Compile the file once, returns the seconds of each stage and the tokens"""
+    seconds = {}
+
+    start = time.perf_counter()
+    tokenizer = Tokenizer(jack_fn)
+    seconds["tokenize"] = time.perf_counter() - start
+    n_tokens = len(tokenizer.tokens)
+
+    start = time.perf_counter()
+    class_node = CompilationEngine(tokenizer, CLASS_NAME).compile_class()
+    seconds["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parse_tree = XMLParseTreeWriter(os.path.join(output_dir, CLASS_NAME + ".xml"))
+    render_parse_tree(class_node, parse_tree)
+    parse_tree.close()
+    seconds["xml"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vm = CodeGenerator(CLASS_NAME, False).compile_class(class_node)
+    seconds["codegen"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(os.path.join(output_dir, CLASS_NAME + ".vm"), "w") as f:
+        f.write(vm)
+    seconds["write_vm"] = time.perf_counter() - start
+
+    return seconds, n_tokens
+
+
+def run(generator: JackGenerator, repeat: int) -> dict:
+    """Best time of each stage over repeat runs, with throughputs, as a dict"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        jack_fn = os.path.join(output_dir, CLASS_NAME + ".jack")
+        with open(jack_fn, "w") as f:
+            f.write(generator.generate(CLASS_NAME))
+        with open(jack_fn) as f:
+            n_lines = sum(1 for _ in f)
+        n_bytes = os.path.getsize(jack_fn)
+
+        best_seconds = {}
+        for _ in range(repeat):
+            seconds, n_tokens = time_stages(jack_fn, output_dir)
+            for stage, stage_seconds in seconds.items():
+                if stage_seconds < best_seconds.get(stage, float("inf")):
+                    best_seconds[stage] = stage_seconds
+
+    stages = {}
+    for stage in STAGES + ["total"]:
+        if stage == "total":
+            stage_seconds = sum(best_seconds.values())
+        else:
+            stage_seconds = best_seconds[stage]
+        stages[stage] = {
+            "seconds": stage_seconds,
+            "tokens_per_s": n_tokens / stage_seconds,
+            "lines_per_s": n_lines / stage_seconds,
+        }
+
+    return {
+        "config": {
+            "subroutines": generator.subroutines,
+            "statements": generator.statements,
+            "depth": generator.depth,
+            "string_density": generator.string_density,
+            "comment_density": generator.comment_density,
+            "seed": generator.seed,
+            "repeat": repeat,
+        },
+        "source": {"lines": n_lines, "tokens": n_tokens, "bytes": n_bytes},
+        "stages": stages,
+        "peak_rss_kb": peak_rss_kb(),
+        "python": platform.python_version(),
+    }
+
+
+def print_results(results: dict, baseline: dict = None) -> None:
+    source = results["source"]
+    print(f"{source['lines']} lines, {source['tokens']} tokens")
+    for stage, stats in results["stages"].items():
+        line = (
+            f"{stage:<10} {stats['seconds'] * 1000:>9.1f} ms "
+            f"{stats['tokens_per_s']:>14,.0f} tokens/s "
+            f"{stats['lines_per_s']:>12,.0f} lines/s"
+        )
+        if baseline is not None and stage in baseline["stages"]:
+            baseline_seconds = baseline["stages"][stage]["seconds"]
+            change = (stats["seconds"] - baseline_seconds) / baseline_seconds * 100
+            line += f" {change:>+7.1f}% time vs baseline"
+        print(line)
+    print(f"peak RSS   {results['peak_rss_kb']:>9,} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--output",
+        default="benchmark_results.json",
+        help="JSON file to write the results to (default: benchmark_results.json)",
+    )
+    parser.add_argument(
+        "--baseline", help="JSON results of an earlier run to compare to"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Runs to take the best time of"
+    )
+    parser.add_argument("--subroutines", type=int, default=200)
+    parser.add_argument("--statements", type=int, default=50)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--string-density", type=float, default=0.1)
+    parser.add_argument("--comment-density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = JackGenerator(
+        args.subroutines,
+        args.statements,
+        args.depth,
+        args.string_density,
+        args.comment_density,
+        args.seed,
+    )
+    results = run(generator, args.repeat)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != results["config"]:
+            print("Warning: the baseline was run with a different configuration")
+
+    print_results(results, baseline)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
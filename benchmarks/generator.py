@@ -0,0 +1,152 @@
+"""
+Generator of synthetic, valid Jack classes for benchmarking the compiler at any
+scale. Every class uses a fixed set of fields, locals and OS calls, so it
+compiles without other classes. The same arguments and seed always give the same
+class.
+
+Usage: python benchmarks/generator.py output.jack [--subroutines N] [--statements N]
+       [--depth N] [--string-density P] [--comment-density P] [--seed N]
+"""
+import argparse
+import os
+import random
+
+LOCALS = ["a", "b", "c", "d"]
+FIELDS = ["x", "y"]
+OPS = ["+", "-", "*", "/", "&", "|", "<", ">", "="]
+WORDS = "the quick brown fox jumps over lazy dog score level lives".split()
+
+
+class JackGenerator:
+    """
+    Generates a class with subroutines methods, each with statements top-level
+    statements. if and while statements nest up to depth levels. string_density and
+    comment_density are the chance of a statement printing a string literal and of
+    a comment before a statement
+    """
+
+    def __init__(
+        self,
+        subroutines: int = 50,
+        statements: int = 40,
+        depth: int = 3,
+        string_density: float = 0.1,
+        comment_density: float = 0.2,
+        seed: int = 0,
+    ):
+        self.subroutines = subroutines
+        self.statements = statements
+        self.depth = depth
+        self.string_density = string_density
+        self.comment_density = comment_density
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def generate(self, class_name: str = "Bench") -> str:
+        self.random.seed(self.seed)
+        lines = ["/** Synthetic benchmark class */", f"class {class_name} {{"]
+        lines.append(f"    field int {', '.join(FIELDS)};")
+        lines.append("    field Array values;")
+        lines.append("    static int count;")
+        lines.append("")
+        lines.append(f"    constructor {class_name} new() {{")
+        lines.append("        let values = Array.new(16);")
+        lines.append("        return this;")
+        lines.append("    }")
+
+        for i in range(self.subroutines):
+            lines.append("")
+            lines.append(f"    method int run{i}(int n) {{")
+            lines.append(f"        var int {', '.join(LOCALS)};")
+            for _ in range(self.statements):
+                self._statement(lines, 2, self.depth)
+            lines.append(f"        return {self._expression(2)};")
+            lines.append("    }")
+
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def _variable(self) -> str:
+        return self.random.choice(LOCALS + FIELDS + ["n", "count"])
+
+    def _term(self, depth: int) -> str:
+        choice = self.random.random()
+        if depth <= 0 or choice < 0.35:
+            return self._variable()
+        elif choice < 0.6:
+            return str(self.random.randint(0, 32767))
+        elif choice < 0.7:
+            return f"values[{self._expression(depth - 1)}]"
+        elif choice < 0.8:
+            return f"({self._expression(depth - 1)})"
+        elif choice < 0.9:
+            return f"Math.abs({self._expression(depth - 1)})"
+        return f"-{self._term(depth - 1)}"
+
+    def _expression(self, depth: int) -> str:
+        expression = self._term(depth)
+        for _ in range(self.random.randint(0, 2)):
+            expression += f" {self.random.choice(OPS)} {self._term(depth)}"
+        return expression
+
+    def _statement(self, lines: list, indent: int, depth: int) -> None:
+        pad = "    " * indent
+        if self.random.random() < self.comment_density:
+            lines.append(f"{pad}// {' '.join(self.random.sample(WORDS, 4))}")
+
+        if self.random.random() < self.string_density:
+            words = " ".join(self.random.sample(WORDS, 3))
+            lines.append(f'{pad}do Output.printString("{words}");')
+            return
+
+        choice = self.random.random()
+        if depth > 0 and choice < 0.15:
+            lines.append(f"{pad}if ({self._expression(2)}) {{")
+            self._block(lines, indent + 1, depth - 1)
+            lines.append(f"{pad}}} else {{")
+            self._block(lines, indent + 1, depth - 1)
+            lines.append(f"{pad}}}")
+        elif depth > 0 and choice < 0.25:
+            lines.append(f"{pad}while ({self._expression(2)}) {{")
+            self._block(lines, indent + 1, depth - 1)
+            lines.append(f"{pad}}}")
+        elif choice < 0.35:
+            lines.append(f"{pad}do Output.printInt({self._expression(2)});")
+        elif choice < 0.45:
+            index = self._expression(1)
+            lines.append(f"{pad}let values[{index}] = {self._expression(2)};")
+        else:
+            variable = self.random.choice(LOCALS + FIELDS)
+            lines.append(f"{pad}let {variable} = {self._expression(2)};")
+
+    def _block(self, lines: list, indent: int, depth: int) -> None:
+        for _ in range(self.random.randint(1, 3)):
+            self._statement(lines, indent, depth)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output_file", help="Jack file to write")
+    parser.add_argument("--subroutines", type=int, default=50)
+    parser.add_argument("--statements", type=int, default=40)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--string-density", type=float, default=0.1)
+    parser.add_argument("--comment-density", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    generator = JackGenerator(
+        args.subroutines,
+        args.statements,
+        args.depth,
+        args.string_density,
+        args.comment_density,
+        args.seed,
+    )
+    class_name = os.path.basename(args.output_file).split(".")[0]
+    with open(args.output_file, "w") as f:
+        f.write(generator.generate(class_name))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Microbenchmark for Tokenizer.advance()
+
+Compares advancing over pre-typed tokens with the previous approach of
+classifying every token again on each advance(), using list scans and int()
+inside a try/except.
+
+Usage: python benchmarks/tokenizer_bench.py [jack_file] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tokenizer import Tokenizer  # noqa: E402
+
+LEGACY_KEYWORDS = (
+    "class constructor function method field static var int char boolean void true "
+    "false null this let do if else while return"
+).split()
+LEGACY_SYMBOLS = list("{}()[].,;+-*/&|<>=~")
+
+SAMPLE_CLASS = """
+/** Sample class used when no Jack file is given */
+class Sample {
+    field int x, y;
+    static String name;
+
+    method int area(int width, int height) {
+        var int i, total;
+        let i = 0;
+        while (i < width) {
+            let total = total + (height * 16) - (x / 2); // inline comment
+            let i = i + 1;
+        }
+        if (~(total = 0) & (y > 1)) {
+            do Output.printString("area: ");
+            do Output.printInt(total);
+        }
+        return total;
+    }
+}
+"""
+
+
+def legacy_token_type(token):
+    """Classification as previously done on every advance()"""
+    if token in LEGACY_KEYWORDS:
+        return "keyword"
+    elif token in LEGACY_SYMBOLS:
+        return "symbol"
+
+    try:
+        int(token)
+        return "integerConstant"
+    except ValueError:
+        pass
+
+    if token.startswith('"'):
+        return "stringConstant"
+    else:
+        return "identifier"
+
+
+def bench_advance(jack_fn):
+    tokenizer = Tokenizer(jack_fn)
+    start = time.perf_counter()
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+    return len(tokenizer.tokens), time.perf_counter() - start
+
+
+def bench_legacy_advance(jack_fn):
+    tokenizer = Tokenizer(jack_fn)
+    # raw tokens as the previous tokenizer stored them, string constants quoted
+    raw_tokens = [
+        f'"{token.token}"' if token.token_type == "stringConstant" else token.token
+        for token in tokenizer.tokens
+    ]
+
+    start = time.perf_counter()
+    index = -1
+    while index < len(raw_tokens) - 1:
+        index += 1
+        token = raw_tokens[index]
+        token_type = legacy_token_type(token)
+        token = token[1:-1] if token_type == "stringConstant" else token
+    return len(raw_tokens), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("jack_file", nargs="?", help="Jack file to tokenize")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=2000,
+        help="Copies of the built-in sample class to tokenize if no file is given",
+    )
+    args = parser.parse_args()
+
+    if args.jack_file:
+        jack_fn = args.jack_file
+    else:
+        with tempfile.NamedTemporaryFile("w", suffix=".jack", delete=False) as f:
+            f.write(SAMPLE_CLASS * args.repeat)
+        jack_fn = f.name
+
+    try:
+        n_tokens, new_time = bench_advance(jack_fn)
+        _, legacy_time = bench_legacy_advance(jack_fn)
+    finally:
+        if not args.jack_file:
+            os.remove(jack_fn)
+
+    print(f"{n_tokens} tokens")
+    print(f"classify on advance: {n_tokens / legacy_time:>12,.0f} tokens/s")
+    print(f"pre-typed tokens:    {n_tokens / new_time:>12,.0f} tokens/s")
+    print(f"speedup:             {legacy_time / new_time:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+
+MANIFEST_FN = ".build_manifest.json"
+
+_compiler_version = None
+
+
+def compiler_version() -> str:
+    """
+    Digest of the compiler's own source, so any change to the compiler invalidates
+    every manifest built with the previous version
+    """
+    global _compiler_version
+    if _compiler_version is None:
+        compiler_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for fn in sorted(os.listdir(compiler_dir)):
+            if fn.endswith(".py"):
+                with open(os.path.join(compiler_dir, fn), "rb") as f:
+                    digest.update(fn.encode())
+                    digest.update(f.read())
+        _compiler_version = digest.hexdigest()
+    return _compiler_version
+
+
+def file_hash(fn: str) -> str:
+    with open(fn, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class BuildManifest:
+    """
+    Record of the Jack files compiled into a vm directory: a hash of each source
+    along with the flags it was compiled with and the outputs it produced. Used to
+    skip files whose outputs are already up to date
+    """
+
+    def __init__(self, vm_dir: str):
+        self.manifest_fn = os.path.join(vm_dir, MANIFEST_FN)
+        self.vm_dir = vm_dir
+        self.files = {}
+        # hashes computed by self.is_current(), to be recorded once compiled
+        self.pending = {}
+
+        try:
+            with open(self.manifest_fn) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            # missing or corrupt manifest, everything will be recompiled
+            return
+
+        if manifest.get("compiler") == compiler_version():
+            self.files = manifest.get("files", {})
+
+    def is_current(self, jack_fn: str, flags: dict, outputs: list) -> bool:
+        """
+        Whether jack_fn was last compiled from the same source, by the same compiler
+        with the same flags, and all of its outputs still exist
+        """
+        source = self._stat(jack_fn)
+        entry = self.files.get(os.path.basename(jack_fn))
+
+        if (
+            entry is not None
+            and entry["flags"] == flags
+            and entry["outputs"] == outputs
+            and all(os.path.exists(os.path.join(self.vm_dir, fn)) for fn in outputs)
+        ):
+            if [entry["size"], entry["mtime_ns"]] == list(source):
+                # unchanged since it was last hashed, no need to read it
+                return True
+
+            source_hash = file_hash(jack_fn)
+            if entry["hash"] == source_hash:
+                # touched but not changed, remember the new mtime
+                entry["size"], entry["mtime_ns"] = source
+                return True
+        else:
+            source_hash = file_hash(jack_fn)
+
+        self.pending[jack_fn] = (source_hash, source)
+        return False
+
+    def _stat(self, jack_fn: str) -> tuple:
+        stat = os.stat(jack_fn)
+        return stat.st_size, stat.st_mtime_ns
+
+    def record(self, jack_fn: str, flags: dict, outputs: list) -> None:
+        """Record that jack_fn was compiled with the given flags and outputs"""
+        if jack_fn in self.pending:
+            source_hash, (size, mtime_ns) = self.pending.pop(jack_fn)
+        else:
+            # not checked with self.is_current(), e.g. in a forced rebuild
+            size, mtime_ns = self._stat(jack_fn)
+            source_hash = file_hash(jack_fn)
+        self.files[os.path.basename(jack_fn)] = {
+            "hash": source_hash,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "flags": flags,
+            "outputs": outputs,
+        }
+
+    def discard(self, jack_fn: str) -> None:
+        """Forget jack_fn, e.g. because it failed to compile"""
+        self.pending.pop(jack_fn, None)
+        self.files.pop(os.path.basename(jack_fn), None)
+
+    def save(self) -> None:
+        manifest = {"compiler": compiler_version(), "files": self.files}
+        os.makedirs(self.vm_dir, exist_ok=True)
+        with open(self.manifest_fn, "w") as f:
+            json.dump(manifest, f, indent=2)
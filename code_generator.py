@@ -0,0 +1,487 @@
+import jack_ast
+from strength_reduction import StrengthReducer
+from symbol_table import Symbol, SymbolTable
+from vm_optimizer import DeadCodeEliminator, PeepholeOptimizer
+from vm_writer import VMWriter
+
+KEYWORD_CONSTANT_VALUES = {"true": -1, "false": 0, "null": 0}
+
+
+def to_int16(value: int) -> int:
+    """Wrap an integer to the signed 16-bit range of the Hack platform"""
+    return (value + 32768) % 65536 - 32768
+
+
+def fold_binary_op(op_symbol: str, a: int, b: int):
+    """
+    Value of a op b on the Hack platform, or None when it cannot be computed at
+    compile time (division by zero is left to Math.divide to report)
+    """
+    if op_symbol == "+":
+        return to_int16(a + b)
+    elif op_symbol == "-":
+        return to_int16(a - b)
+    elif op_symbol == "*":
+        return to_int16(a * b)
+    elif op_symbol == "/":
+        if b == 0:
+            return None
+        # Math.divide truncates towards zero
+        quotient = abs(a) // abs(b)
+        return to_int16(quotient if (a < 0) == (b < 0) else -quotient)
+    elif op_symbol == "&":
+        return a & b
+    elif op_symbol == "|":
+        return a | b
+    elif op_symbol == "<":
+        return -1 if a < b else 0
+    elif op_symbol == ">":
+        return -1 if a > b else 0
+    elif op_symbol == "=":
+        return -1 if a == b else 0
+    return None
+
+
+class CodeGenerator:
+    """
+    Compiles the jack_ast.Class of a file to VM code, kept in self.vm_writer or
+    streamed to the file object vm_output one subroutine at a time. With
+    write_symbol_tables, the symbol table of the class and of each subroutine are
+    kept in self.symbol_tables, keyed by "Class" and "Class.subroutine"
+    """
+
+    def __init__(
+        self,
+        basename,
+        write_symbol_tables,
+        *,
+        fold_constants=False,
+        peephole=False,
+        pool_strings=False,
+        dead_code=False,
+        multiply_cost=None,
+        vm_output=None,
+        source_name=None,
+        token_position=None,
+    ):
+        self.basename = basename
+        # name of the Jack code in errors, as in CompilationEngine
+        self.source_name = basename + ".jack" if source_name is None else source_name
+        # Tokenizer.token_position of the parsed tokens, to give errors a position
+        self.token_position = token_position
+        self.write_symbol_tables = write_symbol_tables
+        self.fold_constants = fold_constants
+        self.pool_strings = pool_strings
+        # reduce * and / by constants when given the cost of a Math.multiply call
+        self.strength_reducer = None
+        if multiply_cost is not None:
+            self.strength_reducer = StrengthReducer(multiply_cost)
+        # string literal -> (static index, name of the function that builds it)
+        self.string_pool = {}
+
+        optimizers = []
+        if peephole:
+            optimizers.append(PeepholeOptimizer())
+        if dead_code:
+            optimizers.append(DeadCodeEliminator())
+        self.vm_writer = VMWriter(optimizers, vm_output)
+        # reports of the optimization passes, once the class is compiled
+        self.optimization_reports = []
+
+        self.symbol_tables = {}
+        # symbols defined in the class and all its subroutines
+        self.symbol_count = 0
+
+        self.vm_label_index = 0
+
+    def _lookup_variable(self, node) -> Symbol:
+        """Symbol of the variable a VarName, ArrayAccess or LetStatement names"""
+        symbol = self.symbol_table.lookup(node.name)
+        if symbol is None:
+            location = self.source_name
+            if self.token_position is not None and node.token_index is not None:
+                location += ":{}:{}".format(*self.token_position(node.token_index))
+            raise SyntaxError(f'{location}: Undefined variable "{node.name}"')
+        return symbol
+
+    def _get_vm_label(self, suffix: str) -> str:
+        label = self.basename + "_" + suffix + str(self.vm_label_index)
+        self.vm_label_index += 1
+        return label.upper()
+
+    def compile_class(self, class_node: jack_ast.Class) -> str:
+        """Compile the class, returns its VM code (None if streamed to vm_output)"""
+        # intialize symbol table
+        self.symbol_table = SymbolTable()
+
+        for class_var_dec in class_node.class_var_decs:
+            for var_name in class_var_dec.names:
+                self.symbol_table.define(
+                    var_name, class_var_dec.type, class_var_dec.kind
+                )
+        self.symbol_count += len(self.symbol_table.class_table)
+
+        for subroutine in class_node.subroutines:
+            self.compile_subroutine(subroutine)
+
+        self.compile_string_pool()
+
+        if self.write_symbol_tables:
+            self.symbol_tables[self.basename] = self._symbol_tuples(
+                self.symbol_table.class_table
+            )
+
+        self.optimization_reports = self.vm_writer.optimize()
+        return self.vm_writer.get_code()
+
+    def compile_subroutine(self, subroutine: jack_ast.Subroutine) -> None:
+        self.symbol_table.start_subroutine()
+
+        if subroutine.kind == "method":
+            # add "this" as arg 0 for method, reference to current object
+            self.symbol_table.define("this", self.basename, "arg")
+
+        for var_type, var_name in subroutine.parameters:
+            # add arg to subroutine-level symbol table
+            self.symbol_table.define(var_name, var_type, "arg")
+
+        n_locals = 0
+        for var_dec in subroutine.var_decs:
+            for var_name in var_dec.names:
+                # add var to subroutine-level symbol table
+                self.symbol_table.define(var_name, var_dec.type, "var")
+                n_locals += 1
+        self.symbol_count += len(self.symbol_table.subroutine_table)
+
+        if subroutine.kind == "constructor":
+            # TODO: Think of better variable naming here. There are not locals but
+            # rather the number of fields an object has
+            n_locals = self.symbol_table.field_index
+
+        self.vm_writer.write_function(self.basename + "." + subroutine.name, n_locals)
+
+        if subroutine.kind == "method":
+            # push reference to current object onto stack
+            self.vm_writer.write_push("argument", 0)
+            self.vm_writer.write_pop("pointer", 0)
+
+        self.compile_statements(subroutine.statements)
+        self.vm_writer.flush()
+
+        if self.write_symbol_tables:
+            self.symbol_tables[self.basename + "." + subroutine.name] = (
+                self._symbol_tuples(self.symbol_table.subroutine_table)
+            )
+
+    def _symbol_tuples(self, table: dict) -> dict:
+        """A symbol table as name -> (kind, type, index)"""
+        return {name: symbol.as_tuple() for name, symbol in table.items()}
+
+    def compile_statements(self, statements: list) -> None:
+        for statement in statements:
+            statement_type = type(statement)
+            if statement_type is jack_ast.DoStatement:
+                self.compile_do(statement)
+            elif statement_type is jack_ast.LetStatement:
+                self.compile_let(statement)
+            elif statement_type is jack_ast.WhileStatement:
+                self.compile_while(statement)
+            elif statement_type is jack_ast.ReturnStatement:
+                self.compile_return(statement)
+            elif statement_type is jack_ast.IfStatement:
+                self.compile_if(statement)
+            else:
+                raise ValueError(f"Unexpected statement: {statement}")
+
+    def compile_do(self, statement: jack_ast.DoStatement) -> None:
+        self.compile_subroutine_call(statement.call)
+        # void functions/methods return 0, dump this value onto temp
+        self.vm_writer.write_pop("temp", 0)
+
+    def compile_let(self, statement: jack_ast.LetStatement) -> None:
+        # lookup var
+        var = self._lookup_variable(statement)
+
+        if statement.index is not None:
+            # push base address of array onto stack
+            self.vm_writer.write_push(var.segment, var.index)
+            self.compile_expression(statement.index)
+            # add indexing expression value to array base address
+            self.vm_writer.write_arithmetic("+")
+
+            self.compile_expression(statement.value)
+
+            # temporarily store value of right-hand expression
+            self.vm_writer.write_pop("temp", 0)
+            # update that pointer to address of index of the current array
+            self.vm_writer.write_pop("pointer", 1)
+            # push right-hand expression value back to stack
+            self.vm_writer.write_push("temp", 0)
+            # pop value into array
+            self.vm_writer.write_pop("that", 0)
+
+        else:
+            self.compile_expression(statement.value)
+            # write expression value onto the address of the target variable
+            self.vm_writer.write_pop(var.segment, var.index)
+
+    def compile_while(self, statement: jack_ast.WhileStatement) -> None:
+        # generate vm labels for while loop
+        loop_label = self._get_vm_label("WHILE_LOOP")
+        exit_label = self._get_vm_label("WHILE_EXIT")
+
+        self.vm_writer.write_label(loop_label)
+
+        self.compile_expression(statement.condition)
+
+        # negate expression result
+        self.vm_writer.write_unary_arithmetic("~")
+        self.vm_writer.write_if(exit_label)
+
+        self.compile_statements(statement.statements)
+
+        # go back to top of while loop
+        self.vm_writer.write_goto(loop_label)
+
+        # end of while loop
+        self.vm_writer.write_label(exit_label)
+
+    def compile_return(self, statement: jack_ast.ReturnStatement) -> None:
+        if statement.value is None:
+            # void return
+            self.vm_writer.write_return(is_void=True)
+        else:
+            self.compile_expression(statement.value)
+            self.vm_writer.write_return()
+
+    def compile_if(self, statement: jack_ast.IfStatement) -> None:
+        else_label = self._get_vm_label("ELSE_BRANCH")
+        exit_label = self._get_vm_label("IF_EXIT")
+
+        self.compile_expression(statement.condition)
+
+        # negate expression result
+        self.vm_writer.write_unary_arithmetic("~")
+        self.vm_writer.write_if(else_label)
+
+        self.compile_statements(statement.statements)
+
+        # skip past else statement, if present
+        self.vm_writer.write_goto(exit_label)
+        # write else label to vm code, regardless of else presence/absence
+        self.vm_writer.write_label(else_label)
+
+        if statement.else_statements is not None:
+            self.compile_statements(statement.else_statements)
+
+        self.vm_writer.write_label(exit_label)
+
+    def _constant_value(self, term):
+        """Value of a term made only of constants, or None"""
+        term_type = type(term)
+
+        if term_type is jack_ast.IntegerConstant:
+            return int(term.value)
+        elif term_type is jack_ast.KeywordConstant:
+            return KEYWORD_CONSTANT_VALUES.get(term.value)
+        elif term_type is jack_ast.ParenthesizedExpression:
+            value, n_folded = self._fold_expression(term.expression)
+            if n_folded < len(term.expression.op_terms):
+                return None
+            return value
+        elif term_type is jack_ast.UnaryOp:
+            value = self._constant_value(term.term)
+            if value is None:
+                return None
+            return to_int16(-value) if term.op == "-" else ~value
+        return None
+
+    def _fold_expression(self, expression: jack_ast.Expression) -> tuple:
+        """
+        Fold the leading constant terms of an expression. Jack evaluates operators
+        strictly left to right, so only a constant prefix can be folded. Returns
+        its value (None if the first term is not constant) and the number of
+        (op term) groupings folded into it
+        """
+        value = self._constant_value(expression.term)
+        if value is None:
+            return None, 0
+
+        n_folded = 0
+        for op_symbol, term in expression.op_terms:
+            term_value = self._constant_value(term)
+            if term_value is None:
+                break
+            folded_value = fold_binary_op(op_symbol, value, term_value)
+            if folded_value is None:
+                break
+            value = folded_value
+            n_folded += 1
+
+        return value, n_folded
+
+    def _reduce_arithmetic(self, op_symbol: str, value):
+        """Strength reduced VM commands for "op_symbol value", or None"""
+        if self.strength_reducer is None or value is None:
+            return None
+        return self.strength_reducer.reduce(op_symbol, value)
+
+    def compile_expression(self, expression: jack_ast.Expression) -> None:
+        op_terms = expression.op_terms
+
+        leading_value = None
+        if self.fold_constants:
+            value, n_folded = self._fold_expression(expression)
+            if n_folded:
+                leading_value = value
+                op_terms = op_terms[n_folded:]
+
+        vm_commands = None
+        if self.strength_reducer is not None and op_terms and op_terms[0][0] == "*":
+            value = leading_value
+            if value is None:
+                value = self._constant_value(expression.term)
+            vm_commands = self._reduce_arithmetic("*", value)
+
+        if vm_commands is not None:
+            # c * term is compiled as term * c, the constant has no side effects
+            self.compile_term(op_terms[0][1])
+            self.vm_writer.write_commands(vm_commands)
+            op_terms = op_terms[1:]
+        elif leading_value is not None:
+            self.vm_writer.write_constant(leading_value)
+        else:
+            self.compile_term(expression.term)
+
+        # zero or more (op term) groupings
+        for op_symbol, term in op_terms:
+            if op_symbol in ["*", "/"]:
+                vm_commands = self._reduce_arithmetic(
+                    op_symbol, self._constant_value(term)
+                )
+                if vm_commands is not None:
+                    self.vm_writer.write_commands(vm_commands)
+                    continue
+
+            self.compile_term(term)
+            self.vm_writer.write_arithmetic(op_symbol)
+
+    def compile_term(self, term) -> None:
+        term_type = type(term)
+
+        if term_type is jack_ast.IntegerConstant:
+            self.vm_writer.write_push("constant", term.value)
+
+        elif term_type is jack_ast.VarName:
+            # look up var in symbol tables and push to stack
+            var = self._lookup_variable(term)
+            self.vm_writer.write_push(var.segment, var.index)
+
+        elif term_type is jack_ast.SubroutineCall:
+            self.compile_subroutine_call(term)
+
+        elif term_type is jack_ast.ArrayAccess:
+            var = self._lookup_variable(term)
+
+            # push base address of array onto the stack
+            self.vm_writer.write_push(var.segment, var.index)
+
+            self.compile_expression(term.index)
+
+            # add indexing expression value to array base address
+            self.vm_writer.write_arithmetic("+")
+            # update that pointer to address of index of the current array
+            self.vm_writer.write_pop("pointer", 1)
+            # push that value onto stack
+            self.vm_writer.write_push("that", 0)
+
+        elif term_type is jack_ast.ParenthesizedExpression:
+            self.compile_expression(term.expression)
+
+        elif term_type is jack_ast.UnaryOp:
+            value = self._constant_value(term) if self.fold_constants else None
+            if value is not None:
+                self.vm_writer.write_constant(value)
+            else:
+                self.compile_term(term.term)
+                self.vm_writer.write_unary_arithmetic(term.op)
+
+        elif term_type is jack_ast.StringConstant:
+            if self.pool_strings:
+                self.compile_pooled_string(term.value)
+            else:
+                self.vm_writer.write_string(term.value)
+
+        elif term_type is jack_ast.KeywordConstant:
+            if term.value == "true":
+                self.vm_writer.write_push("constant", 0)
+                self.vm_writer.write_unary_arithmetic("~")
+            elif term.value == "false":
+                self.vm_writer.write_push("constant", 0)
+            elif term.value == "this":
+                self.vm_writer.write_push("pointer", 0)
+            elif term.value == "null":
+                self.vm_writer.write_push("constant", 0)
+
+        else:
+            raise ValueError(f"Unexpected term: {term}")
+
+    def compile_subroutine_call(self, call: jack_ast.SubroutineCall) -> None:
+        n_arguments = len(call.arguments)
+
+        if call.receiver is None:
+            # call to a method of current class
+            class_name = self.basename
+
+            self.vm_writer.write_push("pointer", 0)
+            n_arguments += 1
+
+        else:
+            receiver = self.symbol_table.lookup(call.receiver)
+            if receiver is not None:
+                # This is call to a method of an instance of a class
+                class_name = receiver.type
+
+                # Push object base address to stack
+                self.vm_writer.write_push(receiver.segment, receiver.index)
+                # will need to call method with at least one argument (self)
+                n_arguments += 1
+            else:
+                # This is a call to a class function/constructor
+                class_name = call.receiver
+
+        for argument in call.arguments:
+            self.compile_expression(argument)
+
+        self.vm_writer.write_call(class_name + "." + call.name, n_arguments)
+
+    def compile_pooled_string(self, string: str) -> None:
+        """
+        Push the one String object for a literal, stored in a static slot after
+        the class' own statics and built on first use
+        """
+        if string not in self.string_pool:
+            static_index = self.symbol_table.var_count("static") + len(
+                self.string_pool
+            )
+            function_name = f"{self.basename}.__str{len(self.string_pool)}"
+            self.string_pool[string] = (static_index, function_name)
+        static_index, function_name = self.string_pool[string]
+
+        ready_label = self._get_vm_label("STRING_READY")
+
+        # statics start at 0 (null), no String has that address
+        self.vm_writer.write_push("static", static_index)
+        self.vm_writer.write_if(ready_label)
+        self.vm_writer.write_call(function_name, 0)
+        self.vm_writer.write_pop("static", static_index)
+        self.vm_writer.write_label(ready_label)
+        self.vm_writer.write_push("static", static_index)
+
+    def compile_string_pool(self) -> None:
+        """Write the function building each pooled string literal of the class"""
+        for string, (_, function_name) in self.string_pool.items():
+            self.vm_writer.write_function(function_name, 0)
+            self.vm_writer.write_string(string)
+            self.vm_writer.write_return()
+            self.vm_writer.flush()
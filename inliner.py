@@ -0,0 +1,174 @@
+from atomic_file import atomic_write
+from vm_optimizer import hack_words
+
+DEFAULT_INLINE_THRESHOLD = 10
+
+# the temp segment has 8 registers, the arguments of an inlined call are moved there
+MAX_INLINE_ARGS = 8
+
+# commands an inlined body may contain besides push/pop
+INLINE_ARITHMETIC = ["add", "sub", "neg", "eq", "gt", "lt", "and", "or", "not"]
+
+METHOD_PROLOGUE = ["push argument 0", "pop pointer 0"]
+
+
+class InlineCandidate:
+    """Body of a leaf function that can be copied into its callers"""
+
+    __slots__ = ("name", "is_method", "body", "call_words")
+
+    def __init__(self, name: str, is_method: bool, body: list, call_words: int):
+        self.name = name
+        self.is_method = is_method
+        self.body = body
+        # Hack words executed by a call to it, minus those of the body itself
+        self.call_words = call_words
+
+
+class Inliner:
+    """
+    Whole-program inlining of small leaf subroutines. Reads the VM code of every
+    compiled class, builds the call graph between their functions, and replaces
+    each call to a leaf function (one that makes no calls) of at most threshold
+    VM commands with a copy of its body.
+
+    Only straight-line bodies without locals are inlined, that use no segments
+    besides constant, argument and (in methods) this. The arguments of the call
+    are popped into temp registers, and a method's object into the that pointer,
+    so its this i becomes that i. The inlined functions themselves are kept, as
+    code outside the program (e.g. the OS) may call them
+    """
+
+    def __init__(self, threshold: int = DEFAULT_INLINE_THRESHOLD):
+        self.threshold = threshold
+
+    def inline_files(self, vm_fns: list) -> list:
+        """
+        Inline calls in the given VM files, rewriting the files that changed.
+        Returns (caller, callee, estimated Hack words saved per call) of each
+        inlined call site
+        """
+        vm_files = {}
+        for vm_fn in vm_fns:
+            with open(vm_fn) as f:
+                vm_files[vm_fn] = f.read().splitlines()
+
+        call_graph = self.build_call_graph(vm_files)
+        candidates = self._find_candidates(vm_files, call_graph)
+
+        inlined_calls = []
+        for vm_fn, vm_lines in vm_files.items():
+            n_inlined = len(inlined_calls)
+            vm_lines = self._inline_calls(vm_lines, candidates, inlined_calls)
+            if len(inlined_calls) == n_inlined:
+                continue
+
+            # replaced atomically, so an interrupted rewrite never truncates it
+            with atomic_write(vm_fn) as f:
+                f.write("\n".join(vm_lines))
+                f.write("\n")
+            print(f"Inlined {len(inlined_calls) - n_inlined} calls in {vm_fn}")
+
+        return inlined_calls
+
+    def build_call_graph(self, vm_files: dict) -> dict:
+        """Returns the set of functions each function calls, keyed by its name"""
+        call_graph = {}
+        callees = None
+        for vm_lines in vm_files.values():
+            for line in vm_lines:
+                if line.startswith("function "):
+                    callees = call_graph.setdefault(line.split()[1], set())
+                elif line.startswith("call "):
+                    callees.add(line.split()[1])
+        return call_graph
+
+    def _find_candidates(self, vm_files: dict, call_graph: dict) -> dict:
+        candidates = {}
+        for vm_lines in vm_files.values():
+            function_start = None
+            for i, line in enumerate(vm_lines + ["function"]):
+                if not line.startswith("function"):
+                    continue
+                if function_start is not None:
+                    candidate = self._get_candidate(
+                        vm_lines[function_start:i], call_graph
+                    )
+                    if candidate is not None:
+                        candidates[candidate.name] = candidate
+                function_start = i
+        return candidates
+
+    def _get_candidate(self, function_lines: list, call_graph: dict):
+        """Returns an InlineCandidate for a function, or None if it can't be one"""
+        _, name, n_locals = function_lines[0].split()
+        if call_graph[name] or n_locals != "0" or function_lines[-1] != "return":
+            return None
+
+        body = function_lines[1:-1]
+        is_method = body[:2] == METHOD_PROLOGUE
+        if is_method:
+            body = body[2:]
+        if len(body) > self.threshold:
+            return None
+
+        for line in body:
+            command = line.split()
+            if command[0] in ["push", "pop"]:
+                segment = command[1]
+                if segment == "this" and not is_method:
+                    return None
+                if segment not in ["constant", "argument", "this"]:
+                    return None
+            elif command[0] not in INLINE_ARITHMETIC:
+                # calls, branches and returns
+                return None
+
+        call_words = hack_words(function_lines) - hack_words(body)
+        return InlineCandidate(name, is_method, body, call_words)
+
+    def _inline_calls(self, vm_lines: list, candidates: dict, inlined_calls: list):
+        inlined_lines = []
+        caller = None
+        for line in vm_lines:
+            if line.startswith("function "):
+                caller = line.split()[1]
+            elif line.startswith("call "):
+                _, callee, n_args = line.split()
+                n_args = int(n_args)
+                candidate = candidates.get(callee)
+                if candidate is not None and n_args <= MAX_INLINE_ARGS:
+                    inlined_body = self._expand(candidate, n_args)
+                    saved_words = (
+                        hack_words([line])
+                        + candidate.call_words
+                        + hack_words(candidate.body)
+                        - hack_words(inlined_body)
+                    )
+                    inlined_lines += inlined_body
+                    inlined_calls.append((caller, callee, saved_words))
+                    continue
+            inlined_lines.append(line)
+        return inlined_lines
+
+    def _expand(self, candidate: InlineCandidate, n_args: int) -> list:
+        """Body of candidate for a call with n_args arguments on the stack"""
+        # move the arguments off the stack, last one first
+        lines = []
+        for i in reversed(range(n_args)):
+            if candidate.is_method and i == 0:
+                lines.append("pop pointer 1")
+            else:
+                lines.append(f"pop temp {i}")
+
+        for line in candidate.body:
+            command = line.split()
+            if len(command) == 3 and command[1] == "argument":
+                if candidate.is_method and command[2] == "0":
+                    line = f"{command[0]} pointer 1"
+                else:
+                    line = f"{command[0]} temp {command[2]}"
+            elif len(command) == 3 and command[1] == "this":
+                line = f"{command[0]} that {command[2]}"
+            lines.append(line)
+        return lines
@@ -0,0 +1,193 @@
+"""
+Abstract syntax tree of a Jack class, built by CompilationEngine and walked by
+later passes such as CodeGenerator and the XML parse tree renderer. Nodes use
+__slots__ to keep the tree small.
+"""
+
+
+class Node:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+# Program structure
+
+
+class Class(Node):
+    __slots__ = ("name", "class_var_decs", "subroutines")
+
+    def __init__(self, name: str, class_var_decs: list, subroutines: list):
+        self.name = name
+        self.class_var_decs = class_var_decs
+        self.subroutines = subroutines
+
+
+class ClassVarDec(Node):
+    __slots__ = ("kind", "type", "names")
+
+    def __init__(self, kind: str, type: str, names: list):
+        # kind is "static" or "field"
+        self.kind = kind
+        self.type = type
+        self.names = names
+
+
+class Subroutine(Node):
+    __slots__ = ("kind", "return_type", "name", "parameters", "var_decs", "statements")
+
+    def __init__(
+        self,
+        kind: str,
+        return_type: str,
+        name: str,
+        parameters: list,
+        var_decs: list,
+        statements: list,
+    ):
+        # kind is "constructor", "function" or "method"
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        # (type, name) of each parameter
+        self.parameters = parameters
+        self.var_decs = var_decs
+        self.statements = statements
+
+
+class VarDec(Node):
+    __slots__ = ("type", "names")
+
+    def __init__(self, type: str, names: list):
+        self.type = type
+        self.names = names
+
+
+# Statements
+
+
+class LetStatement(Node):
+    __slots__ = ("name", "index", "value", "token_index")
+
+    def __init__(self, name: str, index, value, token_index: int = None):
+        self.name = name
+        # Expression for let name[index] = value, None otherwise
+        self.index = index
+        self.value = value
+        # index of the name's token in the Tokenizer, to locate errors
+        self.token_index = token_index
+
+
+class IfStatement(Node):
+    __slots__ = ("condition", "statements", "else_statements")
+
+    def __init__(self, condition, statements: list, else_statements):
+        self.condition = condition
+        self.statements = statements
+        # None if there is no else branch
+        self.else_statements = else_statements
+
+
+class WhileStatement(Node):
+    __slots__ = ("condition", "statements")
+
+    def __init__(self, condition, statements: list):
+        self.condition = condition
+        self.statements = statements
+
+
+class DoStatement(Node):
+    __slots__ = ("call",)
+
+    def __init__(self, call):
+        self.call = call
+
+
+class ReturnStatement(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        # None for a void return
+        self.value = value
+
+
+# Expressions
+
+
+class Expression(Node):
+    __slots__ = ("term", "op_terms")
+
+    def __init__(self, term, op_terms: list):
+        self.term = term
+        # (op, term) pairs following the first term, evaluated left to right
+        self.op_terms = op_terms
+
+
+class IntegerConstant(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        self.value = value
+
+
+class StringConstant(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        self.value = value
+
+
+class KeywordConstant(Node):
+    __slots__ = ("value",)
+
+    def __init__(self, value: str):
+        # "true", "false", "null" or "this"
+        self.value = value
+
+
+class VarName(Node):
+    __slots__ = ("name", "token_index")
+
+    def __init__(self, name: str, token_index: int = None):
+        self.name = name
+        # index of the name's token in the Tokenizer, to locate errors
+        self.token_index = token_index
+
+
+class ArrayAccess(Node):
+    __slots__ = ("name", "index", "token_index")
+
+    def __init__(self, name: str, index, token_index: int = None):
+        self.name = name
+        self.index = index
+        # index of the name's token in the Tokenizer, to locate errors
+        self.token_index = token_index
+
+
+class SubroutineCall(Node):
+    __slots__ = ("receiver", "name", "arguments")
+
+    def __init__(self, receiver, name: str, arguments: list):
+        # class or variable name before the '.', None for a call to a method of the
+        # current object
+        self.receiver = receiver
+        self.name = name
+        self.arguments = arguments
+
+
+class ParenthesizedExpression(Node):
+    __slots__ = ("expression",)
+
+    def __init__(self, expression):
+        self.expression = expression
+
+
+class UnaryOp(Node):
+    __slots__ = ("op", "term")
+
+    def __init__(self, op: str, term):
+        # "-" or "~"
+        self.op = op
+        self.term = term
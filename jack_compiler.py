@@ -1,54 +1,573 @@
 import os
+import io
+import sys
+import time
 import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
 
+from atomic_file import atomic_write
+from build_manifest import BuildManifest
+from code_generator import CodeGenerator
 from compilation_engine import CompilationEngine
-from tokenizer import Tokenizer
+from inliner import DEFAULT_INLINE_THRESHOLD, Inliner
+from parse_tree import XMLParseTreeWriter, render_parse_tree
+from profiler import NULL_PROFILE, Profile, print_summary, write_report
+from strength_reduction import DEFAULT_MULTIPLY_COST
+from symbol_table import SYMBOL_DATABASE, write_symbol_database
+from tokenizer import TokenTable, Tokenizer
+from vm_binary import convert, encode
+
+
+class CompileResult:
+    """
+    Outputs of compiling one Jack class in memory. Outputs that were not asked
+    for are None
+    """
+
+    __slots__ = (
+        "class_name",
+        "vm",
+        "binary",
+        "xml",
+        "tokens",
+        "symbol_tables",
+        "optimization_reports",
+    )
+
+    def __init__(
+        self,
+        class_name,
+        vm,
+        binary=None,
+        xml=None,
+        tokens=None,
+        symbol_tables=None,
+        optimization_reports=(),
+    ):
+        self.class_name = class_name
+        # VM code, as the text of a .vm file
+        self.vm = vm
+        # VM code in the binary format of vm_binary, as bytes
+        self.binary = binary
+        # parse tree and tokens, as the text of the .xml and T.xml files
+        self.xml = xml
+        self.tokens = tokens
+        # {"Class": {...}, "Class.subroutine": {...}}, name -> (kind, type, index)
+        self.symbol_tables = symbol_tables
+        # a line for each optimization pass run over the VM code
+        self.optimization_reports = optimization_reports
+
+
+def compile_source(
+    source,
+    class_name: str = None,
+    *,
+    xml: bool = False,
+    tokens: bool = False,
+    symbol_tables: bool = False,
+    binary: bool = False,
+    fold_constants: bool = False,
+    peephole: bool = False,
+    pool_strings: bool = False,
+    dead_code: bool = False,
+    multiply_cost: int = None,
+    token_table: TokenTable = None,
+    vm_output=None,
+    profile=NULL_PROFILE,
+) -> CompileResult:
+    """
+    Compile the Jack code of a class entirely in memory, without touching the file
+    system. source is a str, UTF-8 bytes or a file object to read it from. If
+    class_name is given, the class must have that name, like a file's class must
+    match the file name. The other options are those of JackCompiler. Raises
+    SyntaxError if the code does not compile, including for undefined variables,
+    and ValueError if binary and the class has more function and label names than
+    the binary format can hold
+
+    To keep memory use down for large classes, pass a file object as vm_output to
+    stream the VM code to it one subroutine at a time. The result then has no vm
+    or binary. Pass a profiler.Profile as profile to time each phase
+    """
+    if hasattr(source, "read"):
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = bytes(source).decode()
+
+    with profile.phase("tokenize"):
+        tokenizer = Tokenizer(token_table=token_table, source=source)
+    xml_output = io.StringIO() if xml else None
+    tokens_output = io.StringIO() if tokens else None
+    result = compile_tokens(
+        tokenizer,
+        class_name,
+        xml_output=xml_output,
+        tokens_output=tokens_output,
+        symbol_tables=symbol_tables,
+        binary=binary,
+        fold_constants=fold_constants,
+        peephole=peephole,
+        pool_strings=pool_strings,
+        dead_code=dead_code,
+        multiply_cost=multiply_cost,
+        vm_output=vm_output,
+        profile=profile,
+    )
+    if xml:
+        result.xml = xml_output.getvalue()
+    if tokens:
+        result.tokens = tokens_output.getvalue()
+    return result
+
+
+def compile_tokens(
+    tokenizer: Tokenizer,
+    class_name: str = None,
+    *,
+    xml_output=None,
+    tokens_output=None,
+    symbol_tables: bool = False,
+    binary: bool = False,
+    fold_constants: bool = False,
+    peephole: bool = False,
+    pool_strings: bool = False,
+    dead_code: bool = False,
+    multiply_cost: int = None,
+    vm_output=None,
+    profile=NULL_PROFILE,
+) -> CompileResult:
+    """
+    compile_source() for the Jack code of a Tokenizer. The XML parse tree and the
+    tokens are streamed as XML to the file objects xml_output and tokens_output if
+    given, so the result has no xml or tokens
+    """
+    if tokens_output is not None:
+        with profile.phase("xml"):
+            tokenizer.write_xml(tokens_output)
+
+    # Parse the class into an AST, then render the XML parse tree and generate the
+    # VM code from it in separate passes
+    with profile.phase("parse"):
+        compilation_engine = CompilationEngine(tokenizer, class_name)
+        class_node = compilation_engine.compile_class()
+
+    if xml_output is not None:
+        with profile.phase("xml"):
+            render_parse_tree(class_node, XMLParseTreeWriter(xml_output))
+
+    with profile.phase("codegen"):
+        code_generator = CodeGenerator(
+            class_node.name,
+            write_symbol_tables=symbol_tables,
+            fold_constants=fold_constants,
+            peephole=peephole,
+            pool_strings=pool_strings,
+            dead_code=dead_code,
+            multiply_cost=multiply_cost,
+            vm_output=vm_output,
+            source_name=compilation_engine.source_name,
+            token_position=tokenizer.token_position,
+        )
+        vm = code_generator.compile_class(class_node)
+
+    binary_vm = None
+    if binary and vm:
+        with profile.phase("write"):
+            binary_vm = encode(code_generator.vm_writer.vm_lines)
+
+    # the parser consumed every token of the class
+    profile.count("tokens", tokenizer.current_token_index + 1)
+    profile.count("vm_instructions", code_generator.vm_writer.instruction_count())
+    profile.count("symbols", code_generator.symbol_count)
+    profile.count("labels", code_generator.vm_label_index)
+
+    return CompileResult(
+        class_node.name,
+        vm,
+        binary_vm,
+        None,
+        None,
+        code_generator.symbol_tables if symbol_tables else None,
+        code_generator.optimization_reports,
+    )
 
 
 class JackCompiler:
-    def __init__(self, target_path: str, write_symbol_tables: bool):
+    def __init__(
+        self,
+        target_path: str,
+        write_symbol_tables: bool,
+        stream: bool = False,
+        write_xml: bool = True,
+        write_tokens: bool = False,
+        jobs: int = 1,
+        force: bool = False,
+        fold_constants: bool = False,
+        peephole: bool = False,
+        pool_strings: bool = False,
+        dead_code: bool = False,
+        inline_threshold: int = None,
+        multiply_cost: int = None,
+        write_binary: bool = False,
+        profile: bool = False,
+        profile_json: str = None,
+    ):
         self.write_symbol_tables = write_symbol_tables
-        if os.path.isdir(target_path):
-            self.jack_fns = [
-                os.path.join(target_path, fn)
-                for fn in os.listdir(target_path)
+        self.stream = stream
+        self.write_xml = write_xml
+        self.write_tokens = write_tokens
+        self.jobs = jobs
+        self.force = force
+        self.fold_constants = fold_constants
+        self.peephole = peephole
+        self.pool_strings = pool_strings
+        self.dead_code = dead_code
+        # inline small leaf subroutines across all files, None to disable
+        self.inline_threshold = inline_threshold
+        # reduce * and / by constants for this Math.multiply cost, None to disable
+        self.multiply_cost = multiply_cost
+        self.write_binary = write_binary
+        # time the phases of compiling each file, and write them to profile_json
+        self.profile = profile or profile_json is not None
+        self.profile_json = profile_json
+        # shared by all files so identifiers and keywords are only stored once
+        self.token_table = TokenTable()
+        self.target_path = target_path
+        self.jack_fns = self._find_jack_fns()
+
+    def _find_jack_fns(self) -> list:
+        if os.path.isdir(self.target_path):
+            # sorted so files are always compiled and logged in the same order
+            jack_fns = [
+                os.path.join(self.target_path, fn)
+                for fn in sorted(os.listdir(self.target_path))
                 if fn.endswith(".jack")
             ]
-            if len(self.jack_fns) == 0:
+            if len(jack_fns) == 0:
                 raise ValueError("No jack files found in the target directory")
-        elif os.path.isfile(target_path) and target_path.endswith(".jack"):
-            self.jack_fns = [target_path]
+        elif os.path.isfile(self.target_path) and self.target_path.endswith(".jack"):
+            jack_fns = [self.target_path]
         else:
             raise ValueError("Target file is a not a jack file")
+        return jack_fns
+
+    def compile(self) -> dict:
+        """
+        Compile every Jack file that is not up to date according to the build
+        manifest of its vm directory, or every file if self.force. Uses a pool of
+        self.jobs processes if more than one. A file that fails to compile does not
+        stop the others. Returns the error of each file that failed, keyed by its
+        file name
 
-    def compile(self):
+        Inlining works on the whole program, so every file is recompiled before
+        the compiled files are inlined together
+
+        With self.profile, prints a table of the time each phase of each file took.
+        With self.write_symbol_tables, the symbol tables of the compiled files are
+        written to the symbol database of each vm directory at once, at the end
+        """
+        force = self.force or self.inline_threshold is not None
+        flags = self._build_flags()
+        manifests = {}
+        jack_fns = []
         for jack_fn in self.jack_fns:
-            print(f"Compiling {jack_fn}")
+            vm_dir, basename = self._get_output_location(jack_fn)
+            if vm_dir not in manifests:
+                manifests[vm_dir] = BuildManifest(vm_dir)
+
+            if force or not manifests[vm_dir].is_current(
+                jack_fn, flags, self._get_outputs(basename)
+            ):
+                jack_fns.append(jack_fn)
+            else:
+                print(f"Up to date {jack_fn}")
+
+        if self.jobs > 1 and len(jack_fns) > 1:
+            results = self._compile_in_pool(jack_fns)
+        else:
+            results = ((None,) + self._compile_for_build(fn) for fn in jack_fns)
+
+        errors = {}
+        profiles = {}
+        # symbol tables of the compiled files of each vm directory
+        symbol_tables = {}
+        # results are in the order of jack_fns, whichever process compiled them
+        for jack_fn, (output, error, profile, file_symbol_tables) in zip(
+            jack_fns, results
+        ):
+            if output:
+                print(output, end="")
+            if profile is not None and error is None:
+                profiles[jack_fn] = profile
+
+            vm_dir, basename = self._get_output_location(jack_fn)
+            if file_symbol_tables is not None:
+                symbol_tables.setdefault(vm_dir, {}).update(file_symbol_tables)
+            if error is None:
+                manifests[vm_dir].record(jack_fn, flags, self._get_outputs(basename))
+            else:
+                print(f"Error compiling {jack_fn}: {error}")
+                errors[jack_fn] = error
+                manifests[vm_dir].discard(jack_fn)
+
+        for vm_dir, vm_dir_symbol_tables in symbol_tables.items():
+            write_symbol_database(vm_dir, vm_dir_symbol_tables)
+        for manifest in manifests.values():
+            manifest.save()
+
+        if self.inline_threshold is not None:
+            self._inline([fn for fn in jack_fns if fn not in errors])
+
+        if profiles:
+            print_summary(profiles)
+            if self.profile_json is not None:
+                write_report(profiles, self.profile_json)
+                print(f"Wrote profile to {self.profile_json}")
+
+        return errors
+
+    def _compile_for_build(self, jack_fn: str) -> tuple:
+        """
+        compile_file() as part of compile(), returns its error, its profile as a
+        dict (None unless self.profile) and its symbol tables (None unless
+        self.write_symbol_tables) to write to the symbol database
+        """
+        profile = Profile() if self.profile else NULL_PROFILE
+        symbol_tables = {} if self.write_symbol_tables else None
+        error = self.compile_file(jack_fn, profile, symbol_tables)
+        return error, profile.as_dict() if self.profile else None, symbol_tables
+
+    def _inline(self, jack_fns: list) -> None:
+        """Inline small leaf subroutines across the VM files of the given files"""
+        vm_fns = []
+        for jack_fn in jack_fns:
+            vm_dir, basename = self._get_output_location(jack_fn)
+            vm_fns.append(os.path.join(vm_dir, basename + ".vm"))
+
+        inlined_calls = Inliner(self.inline_threshold).inline_files(vm_fns)
+        for caller, callee, saved_words in inlined_calls:
+            print(f"  {callee} into {caller}: ~{saved_words} Hack words saved per call")
+
+        if self.write_binary and inlined_calls:
+            # the binary files were written before inlining
+            for vm_fn in vm_fns:
+                convert(vm_fn)
+
+    def watch(self, interval: float = 0.5) -> None:
+        """
+        Compile as usual, then poll the Jack files every interval seconds and
+        recompile each file that changes, until interrupted. New files in the
+        target directory are picked up as well. Each rebuild reuses this process,
+        with its already imported modules and shared token table
+        """
+        self.compile()
+
+        flags = self._build_flags()
+        manifests = {}
+        source_stats = self._get_source_stats()
+        print(f"Watching {self.target_path} for changes, press Ctrl-C to stop")
+
+        try:
+            while True:
+                time.sleep(interval)
+                previous_stats, source_stats = source_stats, self._get_source_stats()
+                self.jack_fns = list(source_stats)
+                if source_stats != previous_stats:
+                    # start a new token table for each rebuild, so names that were
+                    # edited away don't pile up in it for the life of the process
+                    self.token_table = TokenTable()
+
+                if self.inline_threshold is not None:
+                    # a change may affect the code inlined into any other file
+                    if source_stats != previous_stats:
+                        self.compile()
+                    continue
+
+                for jack_fn, stats in source_stats.items():
+                    if previous_stats.get(jack_fn) == stats:
+                        continue
+
+                    vm_dir, basename = self._get_output_location(jack_fn)
+                    if vm_dir not in manifests:
+                        manifests[vm_dir] = BuildManifest(vm_dir)
+
+                    start_time = time.perf_counter()
+                    error = self.compile_file(jack_fn)
+                    latency = (time.perf_counter() - start_time) * 1000
+
+                    if error is None:
+                        print(f"Rebuilt {jack_fn} in {latency:.1f} ms")
+                        manifests[vm_dir].record(
+                            jack_fn, flags, self._get_outputs(basename)
+                        )
+                    else:
+                        print(f"Error compiling {jack_fn} ({latency:.1f} ms): {error}")
+                        manifests[vm_dir].discard(jack_fn)
+                    manifests[vm_dir].save()
+        except KeyboardInterrupt:
+            print("Stopped watching")
+
+    def _get_source_stats(self) -> dict:
+        """Returns (size, mtime) of each Jack file, keyed by its file name"""
+        source_stats = {}
+        try:
+            jack_fns = self._find_jack_fns()
+        except ValueError:
+            # e.g. all Jack files were removed, wait for new ones
+            jack_fns = []
+
+        for jack_fn in jack_fns:
+            try:
+                stat = os.stat(jack_fn)
+            except FileNotFoundError:
+                # removed since the directory was listed
+                continue
+            source_stats[jack_fn] = (stat.st_size, stat.st_mtime_ns)
+        return source_stats
+
+    def _compile_in_pool(self, jack_fns: list):
+        """
+        Yields (output, error, profile, symbol tables) of each file, compiled in a
+        process pool
+        """
+        # hand out files in chunks to keep inter-process overhead low
+        chunksize = max(1, len(jack_fns) // (self.jobs * 4))
+        with ProcessPoolExecutor(
+            self.jobs, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            yield from executor.map(_compile_in_worker, jack_fns, chunksize=chunksize)
+
+    def _build_flags(self) -> dict:
+        """Options that change the outputs of a file, recorded in build manifests"""
+        return {
+            "sym": self.write_symbol_tables,
+            "xml": self.write_xml,
+            "tokens": self.write_tokens,
+            "fold": self.fold_constants,
+            "peephole": self.peephole,
+            "pool_strings": self.pool_strings,
+            "dead_code": self.dead_code,
+            "inline": self.inline_threshold,
+            "multiply_cost": self.multiply_cost,
+            "binary": self.write_binary,
+        }
+
+    def _get_output_location(self, jack_fn: str) -> tuple:
+        """Returns the vm directory and the basename of a Jack file's outputs"""
+        vm_dir = os.path.join(os.path.dirname(jack_fn), "vm")
+        basename = os.path.basename(jack_fn).split(".")[0]
+        return vm_dir, basename
 
-            vm_dir = os.path.join(os.path.dirname(jack_fn), "vm")
-            if not os.path.isdir(vm_dir):
-                os.mkdir(vm_dir)
-            basename = os.path.basename(jack_fn).split(".")[0]
+    def _get_outputs(self, basename: str) -> list:
+        """Files written to the vm directory when compiling a class"""
+        outputs = [basename + ".vm"]
+        if self.write_binary:
+            outputs.append(basename + ".vmb")
+        if self.write_xml:
+            outputs.append(basename + ".xml")
+        if self.write_tokens:
+            outputs.append(basename + "T.xml")
+        if self.write_symbol_tables:
+            outputs.append(SYMBOL_DATABASE)
+        return outputs
 
-            tokenizer = Tokenizer(jack_fn)
-            compilation_engine = CompilationEngine(
-                tokenizer, basename, vm_dir, self.write_symbol_tables
-            )
+    def compile_file(self, jack_fn: str, profile=NULL_PROFILE, symbol_tables=None):
+        """
+        Compile a single Jack file. Returns an error message if it fails. The time
+        of each phase is recorded in profile, a profiler.Profile
 
-            # Run compilation engine to generate XML parse tree and compiled VM code
-            while tokenizer.has_more_tokens():
-                token, token_type = tokenizer.advance()
+        With self.write_symbol_tables, the symbol tables of the class are added to
+        the dict symbol_tables, to write to the symbol database later. Without it,
+        they are written to the symbol database right away
+        """
+        print(f"Compiling {jack_fn}")
 
-                if token == "class":
-                    compilation_engine.compile_class(token, token_type)
-                else:
-                    raise SyntaxError(
-                        f'Expected Jack file with one class, got token "{token}" with '
-                        f'type: "{token_type}"'
-                    )
+        vm_dir, basename = self._get_output_location(jack_fn)
+        os.makedirs(vm_dir, exist_ok=True)
 
-            parse_tree_fn = os.path.join(vm_dir, basename + ".xml")
-            compilation_engine.wrtie_xml_file(parse_tree_fn)
+        # The VM code and XML go to temporary files, which replace the outputs once
+        # the class compiled, so a failed compile never leaves a half-written output
+        suffixes = [".vm"]
+        if self.write_xml:
+            suffixes.append(".xml")
+        if self.write_tokens:
+            suffixes.append("T.xml")
+        output_fns = {
+            suffix: os.path.join(vm_dir, basename + suffix) for suffix in suffixes
+        }
+        vm_fn = output_fns[".vm"]
+        try:
+            with contextlib.ExitStack() as stack:
+                outputs = {
+                    suffix: stack.enter_context(atomic_write(output_fn))
+                    for suffix, output_fn in output_fns.items()
+                }
+                with profile.phase("tokenize"):
+                    tokenizer = Tokenizer(jack_fn, self.stream, self.token_table)
+                result = compile_tokens(
+                    tokenizer,
+                    basename,
+                    xml_output=outputs.get(".xml"),
+                    tokens_output=outputs.get("T.xml"),
+                    symbol_tables=self.write_symbol_tables,
+                    binary=self.write_binary,
+                    fold_constants=self.fold_constants,
+                    peephole=self.peephole,
+                    pool_strings=self.pool_strings,
+                    dead_code=self.dead_code,
+                    multiply_cost=self.multiply_cost,
+                    # with --stream, write each subroutine as soon as it's compiled
+                    vm_output=outputs[".vm"] if self.stream else None,
+                    profile=profile,
+                )
+                with profile.phase("write"):
+                    if result.vm is not None:
+                        outputs[".vm"].write(result.vm)
+
+                for report in result.optimization_reports:
+                    print(f"Optimized {vm_fn} ({report})")
+                if os.path.exists(vm_fn):
+                    print(f"Overwriting {vm_fn}")
+
+                with profile.phase("write"):
+                    # replace the outputs with the temporary files
+                    stack.close()
+
+            with profile.phase("write"):
+                if result.binary is not None:
+                    with open(os.path.join(vm_dir, basename + ".vmb"), "wb") as f:
+                        f.write(result.binary)
+                elif self.write_binary:
+                    # the VM code was streamed, encode it from the file
+                    convert(vm_fn)
+                if result.symbol_tables is not None:
+                    if symbol_tables is not None:
+                        symbol_tables.update(result.symbol_tables)
+                    else:
+                        write_symbol_database(vm_dir, result.symbol_tables)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+
+# compiler used by each worker process of JackCompiler._compile_in_pool()
+_worker_compiler = None
+
+
+def _init_worker(compiler: JackCompiler):
+    global _worker_compiler
+    _worker_compiler = compiler
+
+
+def _compile_in_worker(jack_fn: str):
+    """
+    Compile a file in a worker process. Its output is captured and returned along
+    with any error, its profile and its symbol tables, so the parent process can
+    print them in order and write the symbol database once
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        error, profile, symbol_tables = _worker_compiler._compile_for_build(jack_fn)
+    return output.getvalue(), error, profile, symbol_tables
 
 
 if __name__ == "__main__":
@@ -59,14 +578,165 @@ if __name__ == "__main__":
     )
     parser.add_argument(
         "--sym",
-        help="Write symbol tables to text",
+        help=(
+            f"Write the symbol tables of all classes to vm/{SYMBOL_DATABASE}, "
+            "see python symbol_table.py -h to query it"
+        ),
         action="store_true"
     )
+    parser.add_argument(
+        "--stream",
+        help=(
+            "Lex Jack files lazily from a memory map instead of reading them whole, "
+            "and write VM code one subroutine at a time"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--no-xml",
+        help="Do not write the XML parse tree of each class",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--tokens",
+        help="Write the tokens of each class to XML (*T.xml)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="Number of files to compile in parallel (default: 1)",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--force",
+        help="Recompile every file, even those that are up to date",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--binary",
+        help="Also write VM code in the compact binary format of vm_binary (*.vmb)",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--fold-constants",
+        help="Evaluate constant integer expressions at compile time",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--peephole",
+        help="Rewrite redundant VM instruction sequences before writing each file",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--strength-reduce",
+        help=(
+            "Multiply by constants with add chains where cheaper than Math.multiply, "
+            "and drop divisions by 1"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--multiply-cost",
+        help=(
+            "Estimated Hack instructions of a Math.multiply call, the most an add "
+            f"chain may cost (default: {DEFAULT_MULTIPLY_COST})"
+        ),
+        type=int,
+        default=DEFAULT_MULTIPLY_COST,
+    )
+    parser.add_argument(
+        "--dead-code",
+        help="Remove unreachable VM code and unused labels from each subroutine",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--inline",
+        help=(
+            "Inline calls to small leaf subroutines across all the Jack files "
+            "(always recompiles every file)"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--inline-threshold",
+        help=(
+            "Largest subroutine to inline, in VM commands "
+            f"(default: {DEFAULT_INLINE_THRESHOLD})"
+        ),
+        type=int,
+        default=DEFAULT_INLINE_THRESHOLD,
+    )
+    parser.add_argument(
+        "--pool-strings",
+        help=(
+            "Build each distinct string literal once and reuse it from a static, "
+            "instead of building a new String every time (literals become shared)"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "-O",
+        "--optimize",
+        help=(
+            "Enable --fold-constants, --strength-reduce, --peephole and --dead-code"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        help=(
+            "Print the time each phase of compiling each file took, with its "
+            "tokens, VM instructions, symbols and labels"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile-json",
+        help="Also write the --profile report to this JSON file",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--watch",
+        help="Keep running and recompile each Jack file when it changes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        help="Seconds between checks for changed files in watch mode (default: 0.5)",
+        type=float,
+        default=0.5,
+    )
     args = parser.parse_args()
 
     if args.jack_files:
-        compiler = JackCompiler(args.jack_files, args.sym)
-        compiler.compile()
+        compiler = JackCompiler(
+            args.jack_files,
+            args.sym,
+            args.stream,
+            write_xml=not args.no_xml,
+            write_tokens=args.tokens,
+            jobs=args.jobs,
+            force=args.force,
+            fold_constants=args.fold_constants or args.optimize,
+            peephole=args.peephole or args.optimize,
+            pool_strings=args.pool_strings,
+            dead_code=args.dead_code or args.optimize,
+            inline_threshold=args.inline_threshold if args.inline else None,
+            multiply_cost=(
+                args.multiply_cost
+                if args.strength_reduce or args.optimize
+                else None
+            ),
+            write_binary=args.binary,
+            profile=args.profile,
+            profile_json=args.profile_json,
+        )
+        if args.watch:
+            compiler.watch(args.watch_interval)
+        elif compiler.compile():
+            sys.exit(1)
     else:
         print("Please provide one or more Jack files. See help below:\n")
         parser.print_help()
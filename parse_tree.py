@@ -0,0 +1,262 @@
+from xml.sax.saxutils import escape
+
+import jack_ast
+from compilation_engine import PRIMITIVE_TYPES
+
+# minidom escaped double quotes in text as well, keep doing so
+XML_ENTITIES = {'"': "&quot;"}
+
+
+def xml_escape(text: str) -> str:
+    """Escape &, <, > and " in XML text"""
+    return escape(text, XML_ENTITIES)
+
+
+class ParseTreeListener:
+    """
+    Receives the parse tree of a Jack class from render_parse_tree as a series of
+    events, in document order. This base listener ignores every event, so compiling
+    without a parse tree does no parse tree work
+    """
+
+    def start_tag(self, tag: str) -> None:
+        """Start of a non-terminal element, e.g. "letStatement" """
+        pass
+
+    def end_tag(self, tag: str) -> None:
+        """End of the most recently started non-terminal element"""
+        pass
+
+    def terminal(self, token_type: str, token: str) -> None:
+        """A token, e.g. ("keyword", "let")"""
+        pass
+
+
+class XMLParseTreeWriter(ParseTreeListener):
+    """
+    Streams the parse tree to an XML file as it is rendered, in the format of the
+    nand2tetris *.xml files. Elements are indented by two spaces per level, and
+    empty elements are written as an opening and closing tag on separate lines
+    """
+
+    def __init__(self, output_file):
+        """output_file is a file name, or a file object that is left open"""
+        if hasattr(output_file, "write"):
+            self.f = output_file
+            self._owns_file = False
+        else:
+            self.f = open(output_file, "w")
+            self._owns_file = True
+        self.depth = 0
+        # the first line is not preceded by a newline, and no newline ends the file
+        self.newline = ""
+
+    def start_tag(self, tag: str) -> None:
+        self.f.write(f"{self.newline}{'  ' * self.depth}<{tag}>")
+        self.newline = "\n"
+        self.depth += 1
+
+    def end_tag(self, tag: str) -> None:
+        self.depth -= 1
+        self.f.write(f"\n{'  ' * self.depth}</{tag}>")
+
+    def terminal(self, token_type: str, token: str) -> None:
+        self.f.write(
+            f"{self.newline}{'  ' * self.depth}<{token_type}>{xml_escape(token)}"
+            f"</{token_type}>"
+        )
+        self.newline = "\n"
+
+    def close(self) -> None:
+        if self._owns_file:
+            self.f.close()
+
+
+def render_parse_tree(class_node: jack_ast.Class, listener: ParseTreeListener):
+    """
+    Replay the parse tree of a parsed class to the listener. The AST drops
+    punctuation, so it is regenerated here from the Jack grammar
+    """
+    listener.start_tag("class")
+    listener.terminal("keyword", "class")
+    listener.terminal("identifier", class_node.name)
+    listener.terminal("symbol", "{")
+
+    for class_var_dec in class_node.class_var_decs:
+        listener.start_tag("classVarDec")
+        listener.terminal("keyword", class_var_dec.kind)
+        _render_type(class_var_dec.type, listener)
+        _render_names(class_var_dec.names, listener)
+        listener.end_tag("classVarDec")
+
+    for subroutine in class_node.subroutines:
+        _render_subroutine(subroutine, listener)
+
+    listener.terminal("symbol", "}")
+    listener.end_tag("class")
+
+
+def _render_type(type: str, listener: ParseTreeListener) -> None:
+    if type in PRIMITIVE_TYPES:
+        listener.terminal("keyword", type)
+    else:
+        listener.terminal("identifier", type)
+
+
+def _render_names(names: list, listener: ParseTreeListener) -> None:
+    """varName (',' varName)* ';'"""
+    for i, name in enumerate(names):
+        if i:
+            listener.terminal("symbol", ",")
+        listener.terminal("identifier", name)
+    listener.terminal("symbol", ";")
+
+
+def _render_subroutine(subroutine: jack_ast.Subroutine, listener) -> None:
+    listener.start_tag("subroutineDec")
+    listener.terminal("keyword", subroutine.kind)
+    _render_type(subroutine.return_type, listener)
+    listener.terminal("identifier", subroutine.name)
+    listener.terminal("symbol", "(")
+
+    listener.start_tag("parameterList")
+    for i, (var_type, var_name) in enumerate(subroutine.parameters):
+        if i:
+            listener.terminal("symbol", ",")
+        _render_type(var_type, listener)
+        listener.terminal("identifier", var_name)
+    listener.end_tag("parameterList")
+    listener.terminal("symbol", ")")
+
+    listener.start_tag("subroutineBody")
+    listener.terminal("symbol", "{")
+    for var_dec in subroutine.var_decs:
+        listener.start_tag("varDec")
+        listener.terminal("keyword", "var")
+        _render_type(var_dec.type, listener)
+        _render_names(var_dec.names, listener)
+        listener.end_tag("varDec")
+    _render_statements(subroutine.statements, listener)
+    listener.terminal("symbol", "}")
+    listener.end_tag("subroutineBody")
+    listener.end_tag("subroutineDec")
+
+
+def _render_block(statements: list, listener: ParseTreeListener) -> None:
+    """'{' statements '}'"""
+    listener.terminal("symbol", "{")
+    _render_statements(statements, listener)
+    listener.terminal("symbol", "}")
+
+
+def _render_statements(statements: list, listener: ParseTreeListener) -> None:
+    listener.start_tag("statements")
+
+    for statement in statements:
+        statement_type = type(statement)
+
+        if statement_type is jack_ast.LetStatement:
+            listener.start_tag("letStatement")
+            listener.terminal("keyword", "let")
+            listener.terminal("identifier", statement.name)
+            if statement.index is not None:
+                listener.terminal("symbol", "[")
+                _render_expression(statement.index, listener)
+                listener.terminal("symbol", "]")
+            listener.terminal("symbol", "=")
+            _render_expression(statement.value, listener)
+            listener.terminal("symbol", ";")
+            listener.end_tag("letStatement")
+
+        elif statement_type is jack_ast.IfStatement:
+            listener.start_tag("ifStatement")
+            listener.terminal("keyword", "if")
+            listener.terminal("symbol", "(")
+            _render_expression(statement.condition, listener)
+            listener.terminal("symbol", ")")
+            _render_block(statement.statements, listener)
+            if statement.else_statements is not None:
+                listener.terminal("keyword", "else")
+                _render_block(statement.else_statements, listener)
+            listener.end_tag("ifStatement")
+
+        elif statement_type is jack_ast.WhileStatement:
+            listener.start_tag("whileStatement")
+            listener.terminal("keyword", "while")
+            listener.terminal("symbol", "(")
+            _render_expression(statement.condition, listener)
+            listener.terminal("symbol", ")")
+            _render_block(statement.statements, listener)
+            listener.end_tag("whileStatement")
+
+        elif statement_type is jack_ast.DoStatement:
+            listener.start_tag("doStatement")
+            listener.terminal("keyword", "do")
+            _render_subroutine_call(statement.call, listener)
+            listener.terminal("symbol", ";")
+            listener.end_tag("doStatement")
+
+        elif statement_type is jack_ast.ReturnStatement:
+            listener.start_tag("returnStatement")
+            listener.terminal("keyword", "return")
+            if statement.value is not None:
+                _render_expression(statement.value, listener)
+            listener.terminal("symbol", ";")
+            listener.end_tag("returnStatement")
+
+    listener.end_tag("statements")
+
+
+def _render_expression(expression: jack_ast.Expression, listener) -> None:
+    listener.start_tag("expression")
+    _render_term(expression.term, listener)
+    for op_symbol, term in expression.op_terms:
+        listener.terminal("symbol", op_symbol)
+        _render_term(term, listener)
+    listener.end_tag("expression")
+
+
+def _render_term(term, listener: ParseTreeListener) -> None:
+    term_type = type(term)
+    listener.start_tag("term")
+
+    if term_type is jack_ast.IntegerConstant:
+        listener.terminal("integerConstant", term.value)
+    elif term_type is jack_ast.StringConstant:
+        listener.terminal("stringConstant", term.value)
+    elif term_type is jack_ast.KeywordConstant:
+        listener.terminal("keyword", term.value)
+    elif term_type is jack_ast.VarName:
+        listener.terminal("identifier", term.name)
+    elif term_type is jack_ast.ArrayAccess:
+        listener.terminal("identifier", term.name)
+        listener.terminal("symbol", "[")
+        _render_expression(term.index, listener)
+        listener.terminal("symbol", "]")
+    elif term_type is jack_ast.SubroutineCall:
+        _render_subroutine_call(term, listener)
+    elif term_type is jack_ast.ParenthesizedExpression:
+        listener.terminal("symbol", "(")
+        _render_expression(term.expression, listener)
+        listener.terminal("symbol", ")")
+    elif term_type is jack_ast.UnaryOp:
+        listener.terminal("symbol", term.op)
+        _render_term(term.term, listener)
+
+    listener.end_tag("term")
+
+
+def _render_subroutine_call(call: jack_ast.SubroutineCall, listener) -> None:
+    if call.receiver is not None:
+        listener.terminal("identifier", call.receiver)
+        listener.terminal("symbol", ".")
+    listener.terminal("identifier", call.name)
+    listener.terminal("symbol", "(")
+
+    listener.start_tag("expressionList")
+    for i, argument in enumerate(call.arguments):
+        if i:
+            listener.terminal("symbol", ",")
+        _render_expression(argument, listener)
+    listener.end_tag("expressionList")
+    listener.terminal("symbol", ")")
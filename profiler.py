@@ -0,0 +1,106 @@
+import json
+import time
+
+# phases of compiling a file, in the order they run. With --stream, lexing happens
+# while parsing and the VM code is written while generating it, so their time is
+# counted in parse and codegen instead
+PHASES = ["tokenize", "parse", "xml", "codegen", "write"]
+
+COUNTERS = ["tokens", "vm_instructions", "symbols", "labels"]
+
+
+class _Phase:
+    """Context manager adding the wall time of its block to a phase of a Profile"""
+
+    __slots__ = ("seconds", "name", "start")
+
+    def __init__(self, seconds: dict, name: str):
+        self.seconds = seconds
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.seconds[self.name] += time.perf_counter() - self.start
+
+
+class Profile:
+    """Wall time of each phase and counters of compiling one file"""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    def phase(self, name: str) -> _Phase:
+        """Time a block as part of the named phase: with profile.phase("parse"): ..."""
+        return _Phase(self.seconds, name)
+
+    def count(self, name: str, n: int) -> None:
+        self.counters[name] += n
+
+    def as_dict(self) -> dict:
+        """The profile as plain data, to send between processes or write to JSON"""
+        return {"seconds": dict(self.seconds), "counters": dict(self.counters)}
+
+
+class _NullPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class NullProfile:
+    """Profile that records nothing, used when profiling is off"""
+
+    _phase = _NullPhase()
+
+    def phase(self, name: str) -> _NullPhase:
+        return self._phase
+
+    def count(self, name: str, n: int) -> None:
+        pass
+
+
+NULL_PROFILE = NullProfile()
+
+
+def total(profiles: dict) -> dict:
+    """Sum of the profiles (as dicts) of several files"""
+    seconds = dict.fromkeys(PHASES, 0.0)
+    counters = dict.fromkeys(COUNTERS, 0)
+    for profile in profiles.values():
+        for phase in PHASES:
+            seconds[phase] += profile["seconds"][phase]
+        for counter in COUNTERS:
+            counters[counter] += profile["counters"][counter]
+    return {"seconds": seconds, "counters": counters}
+
+
+def print_summary(profiles: dict) -> None:
+    """Print a table of the profile of each file, keyed by its file name"""
+    rows = dict(profiles)
+    rows["total"] = total(profiles)
+    name_width = max(len(name) for name in rows)
+
+    header = f"{'file':<{name_width}}"
+    header += "".join(f" {phase + ' ms':>11}" for phase in PHASES + ["total"])
+    header += "".join(f" {counter:>15}" for counter in COUNTERS)
+    print(header)
+    for name, profile in rows.items():
+        seconds = profile["seconds"]
+        line = f"{name:<{name_width}}"
+        for phase_seconds in list(seconds.values()) + [sum(seconds.values())]:
+            line += f" {phase_seconds * 1000:>11.1f}"
+        line += "".join(f" {n:>15,}" for n in profile["counters"].values())
+        print(line)
+
+
+def write_report(profiles: dict, json_fn: str) -> None:
+    """Write the profile of each file and their total to a JSON file"""
+    with open(json_fn, "w") as f:
+        json.dump({"files": profiles, "total": total(profiles)}, f, indent=2)
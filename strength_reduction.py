@@ -0,0 +1,63 @@
+from vm_optimizer import hack_words
+
+# Estimated Hack instructions a call to Math.multiply runs, including the call
+# itself. An add chain replaces the call when it is estimated to be cheaper
+DEFAULT_MULTIPLY_COST = 200
+
+# temp registers used to copy values, the VM has no dup command
+VALUE_TEMP = "temp 1"
+DOUBLE_TEMP = "temp 2"
+
+
+def multiply_chain(value: int) -> list:
+    """
+    VM commands multiplying the value on top of the stack by a constant, with
+    doublings and adds. The result wraps to 16 bits just like Math.multiply
+    """
+    if value == 0:
+        # the multiplied value is still computed, for its side effects
+        return [f"pop {VALUE_TEMP}", "push constant 0"]
+    if value < 0:
+        return multiply_chain(-value) + ["neg"]
+
+    bits = bin(value)[3:]
+    lines = []
+    if "1" in bits:
+        # keep the value around to add it back in
+        lines += [f"pop {VALUE_TEMP}", f"push {VALUE_TEMP}"]
+    for bit in bits:
+        lines += [f"pop {DOUBLE_TEMP}", f"push {DOUBLE_TEMP}", f"push {DOUBLE_TEMP}"]
+        lines.append("add")
+        if bit == "1":
+            lines += [f"push {VALUE_TEMP}", "add"]
+    return lines
+
+
+class StrengthReducer:
+    """
+    Replaces multiplication and division by a constant with cheaper VM commands,
+    for the cost model given by multiply_cost (see DEFAULT_MULTIPLY_COST).
+
+    Division only has cheap cases for 1 and -1: there is no shift in the VM, and
+    a plain halving chain would round negative numbers down instead of towards
+    zero like Math.divide
+    """
+
+    def __init__(self, multiply_cost: int = DEFAULT_MULTIPLY_COST):
+        self.multiply_cost = multiply_cost
+
+    def reduce(self, op_symbol: str, value: int):
+        """
+        VM commands applying "op_symbol value" to the top of the stack, or None if
+        the OS call is the better choice
+        """
+        if op_symbol == "*":
+            lines = multiply_chain(value)
+            if hack_words(lines) <= self.multiply_cost:
+                return lines
+        elif op_symbol == "/":
+            if value == 1:
+                return []
+            elif value == -1:
+                return ["neg"]
+        return None
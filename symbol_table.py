@@ -1,5 +1,32 @@
 import os
+import sys
 import json
+import argparse
+
+from atomic_file import atomic_write
+
+
+# file in each vm directory holding the symbol tables of all its classes, one
+# JSON record per symbol and line, written with --sym
+SYMBOL_DATABASE = "symbols.jsonl"
+
+# VM memory segment the variables of each kind are stored in
+KIND_SEGMENTS = {"static": "static", "field": "this", "arg": "argument", "var": "local"}
+
+
+class Symbol:
+    """A defined identifier, with the VM segment and index it is stored at"""
+
+    __slots__ = ("kind", "type", "index", "segment")
+
+    def __init__(self, kind: str, type: str, index: int):
+        self.kind = kind
+        self.type = type
+        self.index = index
+        self.segment = KIND_SEGMENTS[kind]
+
+    def as_tuple(self) -> tuple:
+        return self.kind, self.type, self.index
 
 
 class SymbolTable:
@@ -7,6 +34,7 @@ class SymbolTable:
         self.class_table = {}
         self.static_index = 0
         self.field_index = 0
+        self.start_subroutine()
 
     def start_subroutine(self):
         self.subroutine_table = {}
@@ -20,30 +48,27 @@ class SymbolTable:
         VAR identifiers have a subroutine scope
         """
         if kind == "static":
-            self.class_table[name] = (kind, type, self.static_index)
+            self.class_table[name] = Symbol(kind, type, self.static_index)
             self.static_index += 1
         elif kind == "field":
-            self.class_table[name] = (kind, type, self.field_index)
+            self.class_table[name] = Symbol(kind, type, self.field_index)
             self.field_index += 1
         elif kind == "arg":
-            self.subroutine_table[name] = (kind, type, self.arg_index)
+            self.subroutine_table[name] = Symbol(kind, type, self.arg_index)
             self.arg_index += 1
         elif kind == "var":
-            self.subroutine_table[name] = (kind, type, self.var_index)
+            self.subroutine_table[name] = Symbol(kind, type, self.var_index)
             self.var_index += 1
         else:
             # TODO: Enumerate various values allowable for kind?
             raise ValueError(f'Symbol with name: "{name}" has invalid kind: "{kind}"')
 
-    def lookup(self, name: str) -> tuple:
-        kind = self._kind_of(name)
-        if kind is None:
-            # identifier is undefined
-            return None, None, None
-        else:
-            type = self._type_of(name)
-            index = self._index_of(name)
-            return kind, type, index
+    def lookup(self, name: str):
+        """
+        Returns the Symbol of the named identifier in the current scope, or None if
+        it is not defined. Subroutine variables shadow class variables
+        """
+        return self.subroutine_table.get(name) or self.class_table.get(name)
 
     def var_count(self, kind: str) -> int:
         """
@@ -59,51 +84,120 @@ class SymbolTable:
         elif kind == "var":
             return self.var_index
 
-    def _kind_of(self, name: str):
-        """
-        Returns the kind of the named identifier in the current scope. Returns NONE if
-        the identifier is unknown in the current scope
-        """
-        if name in self.subroutine_table:
-            return self.subroutine_table[name][0]
-        elif name in self.class_table:
-            return self.class_table[name][0]
-        else:
-            return None
-
-    def _type_of(self, name: str) -> str:
-        """Returns the type of the named identifier in the current scope"""
-        if name in self.subroutine_table:
-            return self.subroutine_table[name][1]
-        elif name in self.class_table:
-            return self.class_table[name][1]
-        else:
-            raise ValueError(
-                f'Cannot get type of identifier "{name}" as it is not defined in the '
-                "current scope"
-            )
-
-    def _index_of(self, name: str) -> int:
-        if name in self.subroutine_table:
-            return self.subroutine_table[name][2]
-        elif name in self.class_table:
-            return self.class_table[name][2]
-        else:
-            raise ValueError(
-                f'Cannot get index of identifier "{name}" as it is not defined in the '
-                "current scope"
-            )
-
-    def write_class_table(self, dir: str, class_name: str) -> None:
-        """Write class symbol table as strings to .txt file"""
-        if not os.path.isdir(dir):
-            os.mkdir(dir)
-        with open(os.path.join(dir, f"{class_name}.txt"), "w") as f:
-            f.write(json.dumps(self.class_table, indent=2))
-
-    def write_subroutine_table(self, dir: str, class_name: str, subroutine_name: str) -> None:
-        """Write subroutine symbol table as strings to .txt file"""
-        if not os.path.isdir(dir):
-            os.mkdir(dir)
-        with open(os.path.join(dir, f"{class_name}.{subroutine_name}.txt"), "w") as f:
-            f.write(json.dumps(self.subroutine_table, indent=2)) 
+
+def symbol_records(symbol_tables: dict):
+    """
+    Yields a record of each symbol in symbol tables keyed by "Class" and
+    "Class.subroutine", as kept by CodeGenerator. subroutine is None for class
+    variables
+    """
+    for table_name, table in symbol_tables.items():
+        class_name, _, subroutine = table_name.partition(".")
+        for name, (kind, type, index) in table.items():
+            yield {
+                "class": class_name,
+                "subroutine": subroutine or None,
+                "name": name,
+                "kind": kind,
+                "type": type,
+                "index": index,
+            }
+
+
+def read_symbol_database(database_fn: str):
+    """Yields the records of a symbol database, an empty one if it doesn't exist"""
+    try:
+        f = open(database_fn)
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            yield json.loads(line)
+
+
+def write_symbol_database(vm_dir: str, symbol_tables: dict) -> None:
+    """
+    Write the symbol tables of compiled classes to the symbol database of vm_dir
+    (see SYMBOL_DATABASE) in one pass. Records of other classes already in it are
+    kept, those of the given classes are replaced
+    """
+    database_fn = os.path.join(vm_dir, SYMBOL_DATABASE)
+    classes = {table_name.split(".")[0] for table_name in symbol_tables}
+    records = [
+        record
+        for record in read_symbol_database(database_fn)
+        if record["class"] not in classes
+    ]
+    records.extend(symbol_records(symbol_tables))
+    # classes in name order, whichever were compiled in this run, each with its
+    # class variables first and then its subroutines in the order they were defined
+    records.sort(key=lambda record: (record["class"], record["subroutine"] is not None))
+
+    # replaced atomically, so a reader never sees a half-written database
+    with atomic_write(database_fn) as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+
+
+def query_symbols(
+    database_fn: str,
+    class_name: str = None,
+    subroutine: str = None,
+    name: str = None,
+    kind: str = None,
+):
+    """
+    Yields the records of a symbol database that match every given field. A
+    subroutine of "" matches class variables only
+    """
+    for record in read_symbol_database(database_fn):
+        if class_name is not None and record["class"] != class_name:
+            continue
+        if subroutine is not None and (record["subroutine"] or "") != subroutine:
+            continue
+        if name is not None and record["name"] != name:
+            continue
+        if kind is not None and record["kind"] != kind:
+            continue
+        yield record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Look up symbols in the symbol database written with --sym"
+    )
+    parser.add_argument(
+        "database",
+        help=f"Symbol database, or the vm directory containing {SYMBOL_DATABASE}",
+    )
+    parser.add_argument("--class", dest="class_name", help="Class to look in")
+    parser.add_argument(
+        "--subroutine",
+        help='Subroutine to look in, "" for class variables only',
+    )
+    parser.add_argument("--name", help="Name of the symbol")
+    parser.add_argument("--kind", choices=list(KIND_SEGMENTS), help="Kind of symbol")
+    parser.add_argument(
+        "--json", help="Print matching records as JSON lines", action="store_true"
+    )
+    args = parser.parse_args()
+
+    database_fn = args.database
+    if os.path.isdir(database_fn):
+        database_fn = os.path.join(database_fn, SYMBOL_DATABASE)
+    if not os.path.exists(database_fn):
+        print(f"No symbol database at {database_fn}")
+        sys.exit(1)
+
+    for record in query_symbols(
+        database_fn, args.class_name, args.subroutine, args.name, args.kind
+    ):
+        if args.json:
+            print(json.dumps(record))
+            continue
+        scope = record["class"]
+        if record["subroutine"] is not None:
+            scope += "." + record["subroutine"]
+        print(
+            f"{scope} {record['name']}: "
+            f"{record['kind']} {record['type']} {record['index']}"
+        )
@@ -0,0 +1,44 @@
+import pytest
+
+from jack_compiler import compile_source
+
+N_STATEMENTS = 100_000
+N_DECLARATIONS = 1_000
+
+
+def huge_class_source() -> str:
+    """A class with a subroutine of N_STATEMENTS statements and many declarations"""
+    lines = ["class Huge {"]
+    lines += [f"    static int s{i};" for i in range(N_DECLARATIONS)]
+    lines.append("    function void main() {")
+    lines += [f"        var int v{i};" for i in range(N_DECLARATIONS)]
+    for _ in range(N_STATEMENTS // 2):
+        lines.append("        let v0 = v0 + 1;")
+        lines.append("        do Output.printInt(v0);")
+    lines.append("        return;")
+    lines.append("    }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def test_huge_subroutine_compiles_without_recursion_error():
+    result = compile_source(huge_class_source(), "Huge", xml=True)
+
+    vm_lines = result.vm.splitlines()
+    # function, 4 commands per let, 3 per do, then push constant 0 and return
+    assert len(vm_lines) == 1 + N_STATEMENTS // 2 * (4 + 3) + 2
+    assert vm_lines[0] == f"function Huge.main {N_DECLARATIONS}"
+    assert vm_lines[1:5] == ["push local 0", "push constant 1", "add", "pop local 0"]
+    assert result.xml.count("<letStatement>") == N_STATEMENTS // 2
+    assert result.xml.count("<classVarDec>") == N_DECLARATIONS
+
+
+def test_class_name_must_match():
+    with pytest.raises(SyntaxError):
+        compile_source("class Other {}", "Huge")
+
+
+def test_undefined_variable_is_a_syntax_error():
+    source = "class A {\n  function void f() {\n    let y = 1;\n    return;\n  }\n}"
+    with pytest.raises(SyntaxError, match='A.jack:3:9: Undefined variable "y"'):
+        compile_source(source, "A")
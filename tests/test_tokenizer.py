@@ -0,0 +1,71 @@
+import pytest
+
+from tokenizer import Tokenizer
+
+
+def lex(source: str) -> list:
+    return [token for token, _ in Tokenizer(source=source)._iter_tokens()]
+
+
+def lex_stream(tmp_path, source: str) -> list:
+    jack_fn = tmp_path / "Main.jack"
+    jack_fn.write_text(source)
+    tokenizer = Tokenizer(str(jack_fn), stream=True)
+    tokens = []
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+        tokens.append(tokenizer.current_token)
+    return tokens
+
+
+def test_comments_are_skipped():
+    source = "class A { // line\n /* block\n comment */ /** doc */ }"
+    assert lex(source) == ["class", "A", "{", "}"]
+
+
+def test_division_is_a_symbol():
+    assert lex("let x = 4/2;") == ["let", "x", "=", "4", "/", "2", ";"]
+
+
+def test_unterminated_comment_raises():
+    with pytest.raises(SyntaxError, match="Unterminated comment"):
+        lex("class A { /* unterminated }")
+
+
+def test_unterminated_comment_raises_when_streaming(tmp_path):
+    with pytest.raises(SyntaxError, match="Unterminated comment"):
+        lex_stream(tmp_path, "class A { /* unterminated }")
+
+
+def test_unterminated_string_raises():
+    with pytest.raises(SyntaxError, match="line 2, column 10"):
+        lex('class A {\n let s = "abc;\n}')
+
+
+def positions(tokenizer: Tokenizer) -> list:
+    tokens = []
+    while tokenizer.has_more_tokens():
+        tokenizer.advance()
+        tokens.append((tokenizer.current_token, tokenizer.current_token_position))
+    return tokens
+
+
+NON_ASCII_SOURCE = 'class A {\n  /* café\n ü */ let s = "é€𝄞"; // ö\n  let t = x;\n}\n'
+
+
+def test_positions_count_characters_in_both_modes(tmp_path):
+    jack_fn = tmp_path / "A.jack"
+    jack_fn.write_text(NON_ASCII_SOURCE, encoding="utf-8")
+
+    tokens = positions(Tokenizer(str(jack_fn)))
+    assert tokens == positions(Tokenizer(str(jack_fn), stream=True))
+    assert ("é€𝄞", (3, 15)) in tokens
+    assert (";", (3, 20)) in tokens
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_error_columns_count_characters(tmp_path, stream):
+    jack_fn = tmp_path / "A.jack"
+    jack_fn.write_text('class A { let s = "é"; # }', encoding="utf-8")
+    with pytest.raises(SyntaxError, match="line 1, column 24"):
+        positions(Tokenizer(str(jack_fn), stream))
@@ -0,0 +1,165 @@
+import pytest
+
+from code_generator import to_int16
+from jack_compiler import compile_source
+
+BINARY_COMMANDS = {
+    "add": lambda a, b: a + b,
+    "sub": lambda a, b: a - b,
+    "and": lambda a, b: a & b,
+    "or": lambda a, b: a | b,
+    "eq": lambda a, b: -1 if a == b else 0,
+    "gt": lambda a, b: -1 if a > b else 0,
+    "lt": lambda a, b: -1 if a < b else 0,
+}
+UNARY_COMMANDS = {"neg": lambda a: -a, "not": lambda a: ~a}
+OS_FUNCTIONS = {
+    "Math.multiply": lambda a, b: to_int16(a * b),
+    # rounds towards zero
+    "Math.divide": lambda a, b: to_int16(int(a / b)),
+}
+
+
+class VMInterpreter:
+    """
+    Runs the VM code of a class, enough to compare optimized and unoptimized code.
+    Output.printInt is recorded in self.printed, and of the rest of the OS only
+    OS_FUNCTIONS are supported
+    """
+
+    def __init__(self, vm_code: str):
+        self.functions = {}
+        for line in vm_code.splitlines():
+            command = line.split()
+            if command[0] == "function":
+                commands = []
+                self.functions[command[1]] = (int(command[2]), commands)
+            commands.append(command)
+        self.printed = []
+        self.ram = {}
+        self.static = {}
+        self.temp = [0] * 8
+
+    def call(self, name: str, args: list) -> int:
+        if name == "Output.printInt":
+            self.printed.append(args[0])
+            return 0
+        if name in OS_FUNCTIONS:
+            return OS_FUNCTIONS[name](*args)
+
+        n_locals, commands = self.functions[name]
+        labels = {c[1]: i for i, c in enumerate(commands) if c[0] == "label"}
+        segments = {"argument": list(args), "local": [0] * n_locals}
+        pointer = [0, 0]
+        stack = []
+        i = 0
+        while True:
+            command = commands[i]
+            i += 1
+            op = command[0]
+            if op == "push":
+                stack.append(self._read(segments, pointer, command[1], int(command[2])))
+            elif op == "pop":
+                value = stack.pop()
+                self._write(segments, pointer, command[1], int(command[2]), value)
+            elif op in BINARY_COMMANDS:
+                b, a = stack.pop(), stack.pop()
+                stack.append(to_int16(BINARY_COMMANDS[op](a, b)))
+            elif op in UNARY_COMMANDS:
+                stack.append(to_int16(UNARY_COMMANDS[op](stack.pop())))
+            elif op == "goto":
+                i = labels[command[1]]
+            elif op == "if-goto":
+                if stack.pop() != 0:
+                    i = labels[command[1]]
+            elif op == "call":
+                n_args = int(command[2])
+                call_args = stack[len(stack) - n_args :]
+                del stack[len(stack) - n_args :]
+                stack.append(self.call(command[1], call_args))
+            elif op == "return":
+                return stack.pop()
+
+    def _read(self, segments, pointer, segment, index):
+        if segment == "constant":
+            return index
+        if segment in segments:
+            return segments[segment][index]
+        if segment == "pointer":
+            return pointer[index]
+        if segment == "temp":
+            return self.temp[index]
+        if segment == "static":
+            return self.static.get(index, 0)
+        return self.ram.get(pointer[segment == "that"] + index, 0)
+
+    def _write(self, segments, pointer, segment, index, value):
+        if segment in segments:
+            segments[segment][index] = value
+        elif segment == "pointer":
+            pointer[index] = value
+        elif segment == "temp":
+            self.temp[index] = value
+        elif segment == "static":
+            self.static[index] = value
+        else:
+            self.ram[pointer[segment == "that"] + index] = value
+
+
+def run(source: str, args: list, **options) -> list:
+    """Integers printed by A.run(args) compiled with the given options"""
+    interpreter = VMInterpreter(compile_source(source, "A", **options).vm)
+    interpreter.call("A.run", args)
+    return interpreter.printed
+
+
+EMPTY_THEN_BRANCH = """
+class A {
+    function int run(int x) {
+        if (x & 1) {} else { do Output.printInt(x); }
+        if (x < 1) {} else { do Output.printInt(x + 1); }
+        return 0;
+    }
+}
+"""
+
+
+@pytest.mark.parametrize("x", [0, 1, 2, -1])
+def test_peephole_keeps_if_with_integer_condition(x):
+    assert run(EMPTY_THEN_BRANCH, [x], peephole=True) == run(EMPTY_THEN_BRANCH, [x])
+
+
+def test_peephole_inverts_branch_after_comparison():
+    vm = compile_source(EMPTY_THEN_BRANCH, "A", peephole=True).vm
+    assert "lt\nif-goto" in vm
+    assert "and\nnot\nif-goto" in vm
+
+
+LOOPS = """
+class A {
+    function int run(int n) {
+        var int i, sum;
+        while (i < n) {
+            if (i = 3) { let sum = sum + (i * 10); } else { let sum = sum - 1; }
+            let i = i + 1;
+        }
+        do Output.printInt(sum);
+        do Output.printInt(n * 12 / 1);
+        do Output.printInt(-(2 + 3) * 4);
+        return 0;
+    }
+}
+"""
+
+
+@pytest.mark.parametrize("n", [0, 5])
+def test_optimizations_keep_behavior(n):
+    optimized = run(
+        LOOPS,
+        [n],
+        fold_constants=True,
+        peephole=True,
+        dead_code=True,
+        multiply_cost=200,
+    )
+    assert optimized == run(LOOPS, [n])
@@ -1,6 +1,13 @@
-from xml.dom import minidom
+import itertools
+import mmap
+import re
+import sys
+from array import array
+from collections import deque
 
-KEYWORDS = [
+from parse_tree import xml_escape
+
+KEYWORDS = {
     "class",
     "constructor",
     "function",
@@ -22,196 +29,313 @@ KEYWORDS = [
     "else",
     "while",
     "return",
-]
-
-SYMBOLS = [
-    "{",
-    "}",
-    "(",
-    ")",
-    "[",
-    "]",
-    ".",
-    ",",
-    ";",
-    "+",
-    "-",
-    "*",
-    "/",
-    "&",
-    "|",
-    "<",
-    ">",
-    "=",
-    "~",
-]
+}
+
+
+# Single-pass lexer. Whitespace and comments are matched (and skipped) alongside
+# the tokens themselves, so the source is only scanned once. The name of the group
+# that matched gives the token type, except for words, which are either keywords or
+# identifiers. A "/*" left over once the comment group failed has no closing "*/",
+# so it is kept from matching as a symbol and reported as an error instead.
+TOKEN_PATTERN = r"""
+    (?P<space>\s+)
+    | (?P<comment>//[^\n]*|/\*.*?\*/)
+    | "(?P<stringConstant>[^"\n]*)"
+    | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    | (?P<integerConstant>[0-9]+)
+    | (?P<symbol>(?!/\*)[{}()\[\].,;+\-*/&|<>=~])
+    | (?P<error>/\*|"|.)
+"""
+# ASCII only, like the bytes version, so both see the same whitespace and words
+TOKEN_RE = re.compile(TOKEN_PATTERN, re.VERBOSE | re.DOTALL | re.ASCII)
+# bytes version of the lexer, used to scan memory-mapped files in streaming mode
+TOKEN_RE_BYTES = re.compile(TOKEN_PATTERN.encode(), re.VERBOSE | re.DOTALL)
+
+# token types are stored as their index in this tuple
+TOKEN_TYPES = ("keyword", "symbol", "integerConstant", "stringConstant", "identifier")
+TOKEN_TYPE_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+# token types whose values are interned, so they compare by identity
+INTERNED_TOKEN_TYPES = {"keyword", "symbol", "identifier"}
+
+
+class TokenTable:
+    """
+    Table of distinct (token, token_type) pairs. Can be shared by the tokenizers of
+    all files in a compilation so each identifier and keyword is stored once. Each
+    TokenStream keeps the integer and string constants of its file in a table of
+    its own, so the shared table does not grow with them
+    """
+
+    def __init__(self):
+        self.entries = []
+        self.offsets = {}
+
+    def add(self, token: str, token_type: str) -> int:
+        """Returns the offset of the (token, token_type) entry, adding it if new"""
+        key = (token, token_type)
+        offset = self.offsets.get(key)
+        if offset is None:
+            if token_type in INTERNED_TOKEN_TYPES:
+                key = (sys.intern(token), token_type)
+            offset = len(self.entries)
+            self.entries.append(key)
+            self.offsets[key] = offset
+        return offset
+
+    def get(self, token: str, token_type: str) -> tuple:
+        """
+        Returns the shared (token, token_type) entry for keywords, symbols and
+        identifiers without adding constants to the table
+        """
+        if token_type in INTERNED_TOKEN_TYPES:
+            return self.entries[self.add(token, token_type)]
+        return token, token_type
+
+
+class Token:
+    """View of a single token in a TokenStream"""
+
+    __slots__ = ("token", "token_type", "line", "column")
+
+    def __init__(self, token: str, token_type: str, line: int, column: int):
+        self.token = token
+        self.token_type = token_type
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return (
+            f"Token({self.token!r}, {self.token_type!r}, line={self.line}, "
+            f"column={self.column})"
+        )
+
+
+class TokenStream:
+    """
+    Compact store of a file's tokens as parallel arrays of type codes, offsets and
+    line and column numbers. The type code of a token gives the table its offset
+    points into: the shared TokenTable for keywords, symbols and identifiers, the
+    stream's own constant_table for integer and string constants
+    """
+
+    def __init__(self, token_table: TokenTable):
+        self.token_table = token_table
+        self.constant_table = TokenTable()
+        self.type_codes = array("B")
+        self.offsets = array("I")
+        self.lines = array("I")
+        self.columns = array("I")
+        # entries of the table of each type code, indexed by the code
+        self.type_entries = tuple(
+            token_table.entries
+            if token_type in INTERNED_TOKEN_TYPES
+            else self.constant_table.entries
+            for token_type in TOKEN_TYPES
+        )
+
+    def append(self, token: str, token_type: str, line: int, column: int) -> None:
+        self.type_codes.append(TOKEN_TYPE_CODES[token_type])
+        if token_type in INTERNED_TOKEN_TYPES:
+            self.offsets.append(self.token_table.add(token, token_type))
+        else:
+            self.offsets.append(self.constant_table.add(token, token_type))
+        self.lines.append(line)
+        self.columns.append(column)
+
+    def entry(self, index: int) -> tuple:
+        """The (token, token_type) entry of the token at index"""
+        return self.type_entries[self.type_codes[index]][self.offsets[index]]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> Token:
+        token, token_type = self.entry(index)
+        return Token(token, token_type, self.lines[index], self.columns[index])
 
 
 class Tokenizer:
-    def __init__(self, jack_file: str):
-        with open(jack_file) as f:
-            jack = f.read()
+    def __init__(
+        self,
+        jack_file: str = None,
+        stream: bool = False,
+        token_table: TokenTable = None,
+        source: str = None,
+    ):
+        """
+        By default the whole file is tokenized up front into self.tokens. With
+        stream=True the file is memory-mapped and tokens are lexed lazily as
+        has_more_tokens()/advance() ask for them, so memory use does not grow with
+        the size of the file. Pass the same token_table to the tokenizers of
+        several files to share their identifiers and keywords. Pass the Jack code
+        as source instead of a jack_file to tokenize it without reading a file
+        """
+        self.jack_file = jack_file
+        self.stream = stream
+        self.token_table = TokenTable() if token_table is None else token_table
 
-        # Initialize xml
-        self.tokenizer_root = minidom.Document()
-        self.tokenizer_xml = self.tokenizer_root.createElement("tokens")
-        self.tokenizer_root.appendChild(self.tokenizer_xml)
+        if stream:
+            self._token_stream = self._stream_tokens(jack_file)
+            # tokens pulled from the stream but not yet returned by self.advance()
+            self._lookahead = deque()
+            self._current = None
+        else:
+            if source is None:
+                with open(jack_file, encoding="utf-8") as f:
+                    source = f.read()
 
-        # Pre-process jack code
-        jack = self._remove_comment_lines(jack)
-        jack = self._remove_inline_comments(jack)
-        jack = self._remove_multi_line_comments(jack)
-        jack = self._remove_whitespace(jack)
+            self.tokens = TokenStream(self.token_table)
+            for token, token_type, line, column in self._lex(source, TOKEN_RE, "\n"):
+                self.tokens.append(token, token_type, line, column)
 
-        self.tokens = self._get_tokens(jack)
+            # used by self.advance() to look up (token, token_type) entries
+            self._type_entries = self.tokens.type_entries
+            self._type_codes = self.tokens.type_codes
+            self._offsets = self.tokens.offsets
 
         # Initialize token indexer, call self.advance() for first token
         self.current_token_index = -1
-        self.current_token = None
-
-    def _remove_comment_lines(self, jack: str) -> str:
-        jack_lines = jack.splitlines()
-        return "\n".join(
-            [
-                jack_line
-                for jack_line in jack_lines
-                if not jack_line.strip().startswith("//")
-            ]
-        )
 
-    def _remove_inline_comments(self, jack: str) -> str:
-        return "\n".join([jack_line.split("//")[0] for jack_line in jack.splitlines()])
-
-    def _remove_multi_line_comments(self, jack: str) -> str:
-        jack_chars = [char for char in jack]
-
-        jack_no_comments = ""
-
-        # manually enumerate char by char
-        char_iter = enumerate(jack_chars)
-        in_comment = False
-        while True:
-            index, char = next(char_iter)
-
-            if not in_comment and char == "/" and jack_chars[index + 1] == "*":
-                # start of comment
-                in_comment = True
-                next(char_iter)  # skip forward one char
-            elif in_comment and char == "*" and jack_chars[index + 1] == "/":
-                # end of comment
-                in_comment = False
-                next(char_iter)  # skip forward one char
-            elif in_comment:
-                # do not include this char
+    def _lex(self, jack, token_re, newline, decode=False):
+        """
+        Yields (token, token_type, line, column) for every token in the Jack source,
+        skipping whitespace and comments. jack can be a str or, with the bytes
+        token_re and newline and decode=True, any bytes-like object such as an mmap
+        """
+        line = 1
+        line_start = 0
+        # bytes that are not characters of their own on the line so far, so columns
+        # count characters when lexing UTF-8 bytes. Only strings and comments can
+        # hold non-ASCII characters
+        column_shift = 0
+
+        for match in token_re.finditer(jack):
+            token_type = match.lastgroup
+            if token_type == "space" or token_type == "comment":
+                # only keep track of line numbers
+                text = match.group()
+                n_newlines = text.count(newline)
+                if n_newlines:
+                    line += n_newlines
+                    line_start = match.start() + text.rindex(newline) + 1
+                    column_shift = 0
+                if decode and not text.isascii():
+                    line_text = text[text.rfind(newline) + 1 :]
+                    column_shift += len(line_text) - len(line_text.decode())
                 continue
-            else:
-                jack_no_comments += char
-
-            if index == len(jack_chars) - 1:
-                # end of chars
-                break
-
-        return jack_no_comments
-
-    def _remove_whitespace(self, jack: str) -> str:
-        return "".join(line.strip() for line in jack.splitlines())
-
-    def _get_tokens(self, jack: str) -> list:
-        tokens = []
-
-        current_token = ""
-        in_token = False
-        current_string_const = ""
-        in_string_const = False
-
-        for char in jack:
-            if in_token:
-                if char == " ":
-                    # end of token, flush current_token
-                    tokens.append(current_token)
-                    current_token = ""
-                    in_token = False
-                elif char in SYMBOLS:
-                    # end of token, flush current_token and add symbol token
-                    tokens.append(current_token)
-                    tokens.append(char)
-                    current_token = ""
-                    in_token = False
-                else:
-                    # continue current_token
-                    current_token += char
-            elif in_string_const:
-                if char == '"':
-                    # end of string_const, flush current_string_const
-                    current_string_const += char
-                    tokens.append(current_string_const)
-                    current_string_const = ""
-                    in_string_const = False
-                else:
-                    # continue string_const
-                    current_string_const += char
-            else:
-                # not in_token or in_string_const
-                if char in SYMBOLS:
-                    tokens.append(char)
-                elif char == '"':
-                    # start of string_const
-                    in_string_const = True
-                    current_string_const += char
-                elif char == " ":
-                    # ignore spaces
-                    continue
+
+            column = match.start() - line_start + 1 - column_shift
+            token = match.group(token_type)
+            if decode:
+                if token.isascii():
+                    token = token.decode()
+                elif token_type == "error":
+                    # the whole character, not just its first byte
+                    token = jack[match.start() : match.start() + 4]
+                    token = token.decode(errors="ignore")[:1]
                 else:
-                    # start of new token
-                    in_token = True
-                    current_token += char
-
-        return tokens
-
-    def token_type(self, token):
-        if token in KEYWORDS:
-            return "keyword"
-        elif token in SYMBOLS:
-            return "symbol"
-
-        try:
-            int(token)
-            return "integerConstant"
-        except ValueError:
-            pass
-
-        if token.startswith('"'):
-            return "stringConstant"
-        else:
-            return "identifier"
+                    n_bytes = len(token)
+                    token = token.decode()
+                    column_shift += n_bytes - len(token)
+            if token_type == "word":
+                token_type = "keyword" if token in KEYWORDS else "identifier"
+            elif token_type == "error":
+                problem = "Unterminated comment" if token == "/*" else "Unexpected"
+                raise SyntaxError(
+                    f'{problem} "{token}" at line {line}, column {column}'
+                )
+
+            yield token, token_type, line, column
+
+    def _stream_tokens(self, jack_file: str):
+        """Lazily yields (token, token_type, line, column) from a memory-mapped file"""
+        with open(jack_file, "rb") as f:
+            try:
+                jack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files cannot be memory-mapped, and have no tokens anyway
+                return
+
+            with jack:
+                yield from self._lex(jack, TOKEN_RE_BYTES, b"\n", decode=True)
+
+    def _fill_lookahead(self, n_tokens: int) -> bool:
+        """Pull tokens from the stream until n_tokens are buffered, if possible"""
+        while len(self._lookahead) < n_tokens:
+            next_token = next(self._token_stream, None)
+            if next_token is None:
+                return False
+            self._lookahead.append(next_token)
+        return True
+
+    @property
+    def current_token(self) -> str:
+        """Value of the current token, string constants without their quotes"""
+        if self.stream:
+            return self._current[0]
+        return self.tokens.entry(self.current_token_index)[0]
+
+    @property
+    def current_token_position(self) -> tuple:
+        """(line, column) of the current token, both starting at 1"""
+        if self.stream:
+            return self._current[2:]
+        index = self.current_token_index
+        return self.tokens.lines[index], self.tokens.columns[index]
+
+    def token_position(self, index: int) -> tuple:
+        """
+        (line, column) of the token at index. When streaming, the file is lexed
+        again up to it, so this is only meant for reporting errors
+        """
+        if self.stream:
+            tokens = self._stream_tokens(self.jack_file)
+            return next(itertools.islice(tokens, index, None))[2:]
+        return self.tokens.lines[index], self.tokens.columns[index]
 
     def has_more_tokens(self) -> bool:
+        if self.stream:
+            return self._fill_lookahead(1)
         return self.current_token_index < len(self.tokens) - 1
 
     def advance(self) -> tuple([str, str]):
         self.current_token_index += 1
-        self.current_token = self.tokens[self.current_token_index]
-        token_type = self.token_type(self.current_token)
-        token = (
-            self.string_val() if token_type == "stringConstant" else self.current_token
-        )
+        if self.stream:
+            if not self._fill_lookahead(1):
+                raise SyntaxError("Unexpected end of file")
+            self._current = self._lookahead.popleft()
+            token, token_type = self._current[:2]
+            return self.token_table.get(token, token_type)
 
-        return token, token_type
+        index = self.current_token_index
+        return self._type_entries[self._type_codes[index]][self._offsets[index]]
 
     def string_val(self) -> str:
-        # remove quotes around string const
-        return self.current_token[1:-1]
+        # string constants are stored without their quotes
+        return self.current_token
 
-    def write_token_tag(self, token_type: str, token: str):
-        # write tag to *T.xml output
-        tokenizer_tag = self.tokenizer_root.createElement(token_type)
-        token_text = self.tokenizer_root.createTextNode(token)
-        tokenizer_tag.appendChild(token_text)
-        self.tokenizer_xml.appendChild(tokenizer_tag)
+    def _iter_tokens(self):
+        """
+        Yields (token, token_type) for every token in the file, without moving the
+        current token
+        """
+        if self.stream:
+            # lex the file again rather than consuming the lazy token stream
+            for token, token_type, _, _ in self._stream_tokens(self.jack_file):
+                yield token, token_type
+        else:
+            type_entries = self.tokens.type_entries
+            for code, offset in zip(self.tokens.type_codes, self.tokens.offsets):
+                yield type_entries[code][offset]
 
     def write_xml_file(self, output_file: str):
-        xml_str = self.tokenizer_root.toprettyxml()
-        # remove xml header
-        xml_str = "\n".join([l for l in xml_str.splitlines()[1:]])
+        """Stream every token of the file to a *T.xml file"""
         with open(output_file, "w") as f:
-            f.write(xml_str)
+            self.write_xml(f)
+
+    def write_xml(self, f):
+        """Stream every token of the file as XML to the file object f"""
+        f.write("<tokens>")
+        for token, token_type in self._iter_tokens():
+            f.write(f"\n\t<{token_type}>{xml_escape(token)}</{token_type}>")
+        f.write("\n</tokens>")
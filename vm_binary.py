@@ -0,0 +1,209 @@
+"""
+Compact binary format for VM code (*.vmb), written alongside the *.vm text.
+
+All integers are little-endian. A file is made of:
+
+    header    4 bytes   magic "JVMB"
+              u16       format version, currently 1
+              u32       number of strings in the string table
+              u32       number of records
+    strings   for each: u16 length in bytes, then that many bytes of UTF-8
+    records   4 bytes each: u8 opcode, u8 segment, u16 index
+
+Each VM command is one record, except function and call, which are followed by
+an operand record:
+
+    push/pop segment i     segment code (SEGMENTS), index i
+    arithmetic/logical     segment 0, index 0
+    return                 segment 0, index 0
+    label/goto/if-goto L   segment 0, index of L in the string table
+    function f n           segment 0, index of f in the string table, then
+    call f n                 an OPERAND record with segment 0 and index n
+
+Opcodes are given by OPCODES and segments by SEGMENTS. Records are a fixed size
+and names are only stored once, so load() copies the records into an array of
+32-bit words (opcode | segment << 8 | index << 16) without any parsing.
+
+Run as a script to convert between the formats:
+
+    python vm_binary.py Main.vm         writes Main.vmb
+    python vm_binary.py Main.vmb        writes Main.vm
+"""
+
+import os
+import sys
+import struct
+import argparse
+from array import array
+
+MAGIC = b"JVMB"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHII")
+RECORD = struct.Struct("<BBH")
+STRING_LENGTH = struct.Struct("<H")
+
+OPCODES = {
+    "push": 0,
+    "pop": 1,
+    "add": 2,
+    "sub": 3,
+    "neg": 4,
+    "eq": 5,
+    "gt": 6,
+    "lt": 7,
+    "and": 8,
+    "or": 9,
+    "not": 10,
+    "label": 11,
+    "goto": 12,
+    "if-goto": 13,
+    "function": 14,
+    "call": 15,
+    "return": 16,
+}
+OPERAND = 0xFF
+
+SEGMENTS = {
+    "argument": 0,
+    "local": 1,
+    "static": 2,
+    "constant": 3,
+    "this": 4,
+    "that": 5,
+    "pointer": 6,
+    "temp": 7,
+}
+
+COMMANDS = {opcode: command for command, opcode in OPCODES.items()}
+SEGMENT_NAMES = {code: segment for segment, code in SEGMENTS.items()}
+
+NAMED_COMMANDS = ["label", "goto", "if-goto", "function", "call"]
+
+
+def encode(vm_lines: list) -> bytes:
+    """Encode lines of VM code in the binary format"""
+    strings = {}
+    records = []
+    for line in vm_lines:
+        command = line.split()
+        if not command:
+            continue
+        try:
+            opcode = OPCODES[command[0]]
+        except KeyError:
+            raise ValueError(f"Invalid VM command: {line}")
+
+        if command[0] in ["push", "pop"]:
+            records.append((opcode, SEGMENTS[command[1]], int(command[2])))
+        elif command[0] in NAMED_COMMANDS:
+            string_index = strings.setdefault(command[1], len(strings))
+            records.append((opcode, 0, string_index))
+            if command[0] in ["function", "call"]:
+                records.append((OPERAND, 0, int(command[2])))
+        else:
+            records.append((opcode, 0, 0))
+
+    if len(strings) > 0xFFFF:
+        raise ValueError("Too many function and label names for one file")
+
+    data = bytearray(HEADER.pack(MAGIC, VERSION, len(strings), len(records)))
+    for string in strings:
+        encoded = string.encode()
+        data += STRING_LENGTH.pack(len(encoded))
+        data += encoded
+    for record in records:
+        data += RECORD.pack(*record)
+    return bytes(data)
+
+
+def load(data: bytes) -> tuple:
+    """
+    Returns the string table and the records of binary VM code, as an array of
+    32-bit words: opcode | segment << 8 | index << 16. The fast way to load it
+    """
+    magic, version, n_strings, n_records = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary VM file")
+    if version != VERSION:
+        raise ValueError(f"Unsupported binary VM file version: {version}")
+
+    offset = HEADER.size
+    strings = []
+    for _ in range(n_strings):
+        (length,) = STRING_LENGTH.unpack_from(data, offset)
+        offset += STRING_LENGTH.size
+        strings.append(data[offset : offset + length].decode())
+        offset += length
+
+    end = offset + n_records * RECORD.size
+    if end != len(data):
+        raise ValueError("Binary VM file is truncated or has trailing data")
+    records = array("I", data[offset:end])
+    if sys.byteorder == "big":
+        records.byteswap()
+    return strings, records
+
+
+def decode(data: bytes) -> list:
+    """Decode binary VM code back to lines of VM code"""
+    strings, records = load(data)
+
+    vm_lines = []
+    for record in records:
+        opcode, segment, index = record & 0xFF, (record >> 8) & 0xFF, record >> 16
+        if opcode == OPERAND:
+            vm_lines[-1] += f" {index}"
+            continue
+
+        command = COMMANDS[opcode]
+        if command in ["push", "pop"]:
+            vm_lines.append(f"{command} {SEGMENT_NAMES[segment]} {index}")
+        elif command in NAMED_COMMANDS:
+            vm_lines.append(f"{command} {strings[index]}")
+        else:
+            vm_lines.append(command)
+    return vm_lines
+
+
+def write_binary_file(vm_lines: list, vmb_fn: str) -> None:
+    with open(vmb_fn, "wb") as f:
+        f.write(encode(vm_lines))
+
+
+def read_binary_file(vmb_fn: str) -> list:
+    """Returns the lines of VM code in a binary VM file"""
+    with open(vmb_fn, "rb") as f:
+        return decode(f.read())
+
+
+def convert(fn: str, output_fn: str = None) -> str:
+    """Convert a *.vm file to *.vmb or back, returns the file written"""
+    base, ext = os.path.splitext(fn)
+    if ext == ".vm":
+        output_fn = output_fn or base + ".vmb"
+        with open(fn) as f:
+            write_binary_file(f.read().splitlines(), output_fn)
+    elif ext == ".vmb":
+        output_fn = output_fn or base + ".vm"
+        with open(output_fn, "w") as f:
+            f.write("\n".join(read_binary_file(fn)))
+            f.write("\n")
+    else:
+        raise ValueError("File to convert is not a .vm or .vmb file")
+    return output_fn
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert VM code between text (.vm) and binary (.vmb)"
+    )
+    parser.add_argument("vm_file", help="File to convert, .vm or .vmb")
+    parser.add_argument("-o", "--output", help="Output file (default: swap extension)")
+    args = parser.parse_args()
+
+    try:
+        print(f"Wrote {convert(args.vm_file, args.output)}")
+    except (OSError, ValueError) as e:
+        print(f"Error converting {args.vm_file}: {e}")
+        sys.exit(1)
@@ -0,0 +1,218 @@
+"""
+Optimization passes over VM code, run by VMWriter.optimize() over a whole class, or
+by VMWriter.flush() over each function when streaming. Each pass has a name and an
+optimize(vm_lines) method returning the optimized lines
+"""
+
+# Approximate number of Hack instructions (ROM words) the VM translator emits per
+# VM command, used to report what the passes save
+HACK_WORDS = {
+    "push constant": 7,
+    "push static": 6,
+    "push temp": 6,
+    "push pointer": 6,
+    "push": 10,
+    "pop static": 5,
+    "pop temp": 6,
+    "pop pointer": 6,
+    "pop": 12,
+    "add": 5,
+    "sub": 5,
+    "and": 5,
+    "or": 5,
+    "neg": 3,
+    "not": 3,
+    "eq": 13,
+    "gt": 13,
+    "lt": 13,
+    "label": 0,
+    "goto": 2,
+    "if-goto": 5,
+    "function": 1,
+    "call": 44,
+    "return": 50,
+}
+
+
+def hack_words(vm_lines: list) -> int:
+    """Estimated size of the VM code once translated to Hack"""
+    n_words = 0
+    for line in vm_lines:
+        command = line.split(" ", 2)
+        if command[0] in ["push", "pop"]:
+            key = command[0] + " " + command[1]
+            n_words += HACK_WORDS.get(key, HACK_WORDS[command[0]])
+        elif command[0] == "function":
+            # the locals of a function are each initialized with a push constant 0
+            n_words += HACK_WORDS["function"] + int(command[2]) * 7
+        else:
+            n_words += HACK_WORDS[command[0]]
+    return n_words
+
+
+# Peephole rules. Each rule looks at the end of the optimized code so far, right
+# after a new command was appended to it, and rewrites it in place when it matches.
+# Rewritten code is matched again, so rewrites can cascade
+
+
+def drop_push_pop_same_location(lines: list) -> bool:
+    """push X n, pop X n -> (nothing)"""
+    if len(lines) < 2 or not lines[-1].startswith("pop "):
+        return False
+    if lines[-2] != "push " + lines[-1][4:]:
+        return False
+    del lines[-2:]
+    return True
+
+
+def drop_double_not(lines: list) -> bool:
+    """not, not -> (nothing)"""
+    if lines[-2:] != ["not", "not"]:
+        return False
+    del lines[-2:]
+    return True
+
+
+def fold_constant_branch(lines: list) -> bool:
+    """
+    push constant 0, not, if-goto L -> goto L (always taken, e.g. while (true))
+    push constant 0, if-goto L -> (nothing) (never taken)
+    """
+    if not lines[-1].startswith("if-goto "):
+        return False
+    if lines[-3:-1] == ["push constant 0", "not"]:
+        lines[-3:] = ["goto " + lines[-1][8:]]
+        return True
+    if lines[-2:-1] == ["push constant 0"]:
+        del lines[-2:]
+        return True
+    return False
+
+
+# commands whose result is always true (-1) or false (0)
+BOOLEAN_COMMANDS = ["eq", "gt", "lt"]
+
+
+def invert_branch(lines: list) -> bool:
+    """
+    eq/gt/lt, not, if-goto L1, goto L2, label L1 -> eq/gt/lt, if-goto L2, label L1
+
+    The shape of an if without statements, or with the statements in the else
+    branch only. Only done after a comparison: for other values, such as 1, not
+    gives another non-zero value, so dropping it would change the branch taken
+    """
+    if len(lines) < 5 or not lines[-1].startswith("label "):
+        return False
+    target = lines[-1][6:]
+    if lines[-4] != "not" or lines[-3] != "if-goto " + target:
+        return False
+    if lines[-5] not in BOOLEAN_COMMANDS:
+        return False
+    if not lines[-2].startswith("goto "):
+        return False
+    lines[-4:] = ["if-goto " + lines[-2][5:], lines[-1]]
+    return True
+
+
+def drop_goto_next_label(lines: list) -> bool:
+    """goto L, label ..., label L -> label ..., label L"""
+    if not lines[-1].startswith("label "):
+        return False
+    goto = "goto " + lines[-1][6:]
+
+    # labels emit no code, so a goto followed only by labels falls through
+    i = len(lines) - 1
+    while i > 0 and lines[i - 1].startswith("label "):
+        i -= 1
+    if i == 0 or lines[i - 1] != goto:
+        return False
+    del lines[i - 1]
+    return True
+
+
+DEFAULT_RULES = [
+    drop_push_pop_same_location,
+    drop_double_not,
+    fold_constant_branch,
+    invert_branch,
+    drop_goto_next_label,
+]
+
+
+class PeepholeOptimizer:
+    """
+    Runs peephole rules over VM code. A rule is a function that takes the list of
+    optimized lines, rewrites its end in place if it matches and returns whether it
+    did
+    """
+
+    name = "peephole"
+
+    def __init__(self, rules: list = None):
+        self.rules = DEFAULT_RULES if rules is None else rules
+
+    def optimize(self, vm_lines: list) -> list:
+        lines = []
+        for line in vm_lines:
+            lines.append(line)
+            # keep rewriting the end of the code until no rule matches
+            rewritten = True
+            while rewritten and lines:
+                rewritten = any(rule(lines) for rule in self.rules)
+        return lines
+
+
+class DeadCodeEliminator:
+    """
+    Removes the commands of each function that can never run: those after a return
+    or goto, up to the next label, and labels no goto or if-goto refers to. Removing
+    a label can make the code after it unreachable, so both repeat until nothing
+    changes
+    """
+
+    name = "dead code"
+
+    def optimize(self, vm_lines: list) -> list:
+        lines = []
+        function_start = 0
+        for i, line in enumerate(vm_lines):
+            # labels are local to a function, so each function is optimized alone
+            if line.startswith("function ") and i > function_start:
+                lines += self._optimize_function(vm_lines[function_start:i])
+                function_start = i
+        lines += self._optimize_function(vm_lines[function_start:])
+        return lines
+
+    def _optimize_function(self, lines: list) -> list:
+        while True:
+            n_lines = len(lines)
+            lines = self._drop_unreachable(lines)
+            lines = self._drop_unused_labels(lines)
+            if len(lines) == n_lines:
+                return lines
+
+    def _drop_unreachable(self, lines: list) -> list:
+        reachable_lines = []
+        reachable = True
+        for line in lines:
+            if line.startswith("label "):
+                # may be jumped to
+                reachable = True
+            if reachable:
+                reachable_lines.append(line)
+                if line == "return" or line.startswith("goto "):
+                    reachable = False
+        return reachable_lines
+
+    def _drop_unused_labels(self, lines: list) -> list:
+        targets = set()
+        for line in lines:
+            if line.startswith("goto "):
+                targets.add(line[5:])
+            elif line.startswith("if-goto "):
+                targets.add(line[8:])
+        return [
+            line
+            for line in lines
+            if not line.startswith("label ") or line[6:] in targets
+        ]
@@ -1,10 +1,24 @@
-import os
+from vm_optimizer import hack_words
 
 
 class VMWriter:
-    def __init__(self, vm_fn):
-        self.vm_fn = vm_fn
+    """
+    Collects the VM code of a class in memory, see get_code(). Given an output
+    file object instead, the code is streamed to it by flush() one function at a
+    time, so only the function being compiled is kept in memory
+    """
+
+    def __init__(self, optimizers=(), output=None):
         self.vm_lines = []
+        # vm_optimizer passes, run over the code in order
+        self.optimizers = optimizers
+        self.output = output
+        # VM instructions already written to the output
+        self.n_flushed = 0
+        # VM instructions and Hack words before and after each optimization pass
+        self.optimization_stats = {
+            optimizer.name: [0, 0, 0, 0] for optimizer in optimizers
+        }
 
     def write_push(self, segment, index: int) -> None:
         self.vm_lines.append(f"push {segment} {index}")
@@ -12,6 +26,22 @@ class VMWriter:
     def write_pop(self, segment, index: int) -> None:
         self.vm_lines.append(f"pop {segment} {index}")
 
+    def write_constant(self, value: int) -> None:
+        """Push any 16-bit value, the constant segment only holds 0..32767"""
+        if value >= 0:
+            self.write_push("constant", value)
+        elif value == -32768:
+            # 32767 is the largest constant, and ~32767 == -32768
+            self.write_push("constant", 32767)
+            self.vm_lines.append("not")
+        else:
+            self.write_push("constant", -value)
+            self.vm_lines.append("neg")
+
+    def write_commands(self, vm_commands: list) -> None:
+        """Write already generated VM commands, e.g. from StrengthReducer"""
+        self.vm_lines += vm_commands
+
     def write_arithmetic(self, op_symbol: str):
         if op_symbol == "+":
             self.vm_lines.append("add")
@@ -88,12 +118,56 @@ class VMWriter:
             self.write_push("constant", ord(char))
             self.write_call("String.appendChar", 2)
 
-    def close(self):
-        """Write vm code to output text file"""
-        if os.path.exists(self.vm_fn):
-            print(f"Overwriting {self.vm_fn}")
-            os.remove(self.vm_fn)
+    def _run_optimizers(self) -> None:
+        for optimizer in self.optimizers:
+            stats = self.optimization_stats[optimizer.name]
+            stats[0] += len(self.vm_lines)
+            stats[2] += hack_words(self.vm_lines)
+            self.vm_lines = optimizer.optimize(self.vm_lines)
+            stats[1] += len(self.vm_lines)
+            stats[3] += hack_words(self.vm_lines)
+
+    def flush(self) -> None:
+        """
+        When streaming to an output, optimize the code written since the last flush
+        and write it out. Must only be called at the end of a function, as the
+        optimization passes work on whole functions
+        """
+        if self.output is None or not self.vm_lines:
+            return
+        self._run_optimizers()
+        for line in self.vm_lines:
+            self.output.write(line)
+            self.output.write("\n")
+        self.n_flushed += len(self.vm_lines)
+        self.vm_lines = []
+
+    def optimize(self) -> list:
+        """
+        Run the optimization passes over the code still in memory, or flush it when
+        streaming. Returns a report of each pass
+        """
+        if self.output is None:
+            self._run_optimizers()
+        else:
+            self.flush()
+
+        reports = []
+        for name, (n_lines, n_optimized, n_words, n_optimized_words) in (
+            self.optimization_stats.items()
+        ):
+            reports.append(
+                f"{name}: {n_lines} -> {n_optimized} VM instructions "
+                f"(-{n_lines - n_optimized}, ~{n_words - n_optimized_words} Hack words)"
+            )
+        return reports
+
+    def instruction_count(self) -> int:
+        """VM instructions written so far, whether streamed or kept in memory"""
+        return self.n_flushed + len(self.vm_lines)
 
-        with open(self.vm_fn, "w") as f:
-            f.write("\n".join(self.vm_lines))
-            f.write("\n")
+    def get_code(self) -> str:
+        """The VM code as the text of a .vm file, None when streaming"""
+        if self.output is not None:
+            return None
+        return "\n".join(self.vm_lines) + "\n"